@@ -3,20 +3,36 @@ from __future__ import annotations
 
 import logging
 from datetime import timedelta
+from functools import partial
+import shutil
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, PLATFORMS
+from .const import DOMAIN, HISTORY_DIR, PLATFORMS, STORAGE_KEY, STORAGE_VERSION
 from .coordinator import AdGuardDNSDataUpdateCoordinator
+from .services import async_setup_services
+from .websocket_api import async_setup_websocket_api
 
 _LOGGER = logging.getLogger(__name__)
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
 type AdGuardDNSConfigEntry = ConfigEntry[AdGuardDNSDataUpdateCoordinator]
 
 
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the AdGuard DNS services."""
+    async_setup_services(hass)
+    async_setup_websocket_api(hass)
+    return True
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -> bool:
     """Set up AdGuard DNS from a config entry."""
     session = async_get_clientsession(hass)
@@ -27,9 +43,17 @@ async def async_setup_entry(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -
         access_token=entry.data["access_token"],
         refresh_token=entry.data["refresh_token"],
         update_interval=timedelta(seconds=entry.options.get("update_interval", 300)),
+        options=entry.options,
+        entry_id=entry.entry_id,
     )
 
-    await coordinator.async_config_entry_first_refresh()
+    await coordinator.async_load_state()
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        # Unload never runs for an entry that failed to set up
+        await coordinator.async_close_history()
+        raise
 
     entry.runtime_data = coordinator
 
@@ -42,7 +66,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -
 
 async def async_unload_entry(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        await entry.runtime_data.async_save_state()
+        await entry.runtime_data.async_close_history()
+    return unload_ok
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -> None:
+    """Remove the state kept for a deleted config entry."""
+    await Store(hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id=entry.entry_id)).async_remove()
+    await hass.async_add_executor_job(
+        partial(
+            shutil.rmtree,
+            hass.config.path(DOMAIN, HISTORY_DIR, entry.entry_id),
+            ignore_errors=True,
+        )
+    )
 
 
 async def async_update_listener(hass: HomeAssistant, entry: AdGuardDNSConfigEntry) -> None:
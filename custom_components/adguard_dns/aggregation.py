@@ -0,0 +1,40 @@
+"""Domain aggregation for AdGuard DNS statistics."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from operator import itemgetter
+from typing import Any
+
+# Number of domains kept in the top domain lists
+TOP_DOMAINS_COUNT = 10
+
+# Per-record query counters reported by the API
+COUNTER_KEYS = ("queries_count", "blocked_count")
+
+
+def get_counter(record: dict[str, Any], key: str) -> int:
+    """Return a query counter from a record or its statistics object."""
+    if key in record:
+        return record[key] or 0
+    return record.get("statistics", {}).get(key, 0) or 0
+
+
+def domain_counts(
+    devices: Iterable[dict[str, Any]],
+    stats_key: str,
+    rollup: Callable[[str], str] | None = None,
+) -> list[tuple[str, int]]:
+    """Sum per-device domain counts, returning every domain by descending count.
+
+    With a rollup, every domain is mapped through it first, so for example
+    subdomains can be counted towards their registrable domain.
+    """
+    counts: dict[str, int] = {}
+    for device in devices:
+        for domain_info in device.get("statistics", {}).get(stats_key, []):
+            domain = domain_info.get("domain", "")
+            if rollup is not None:
+                domain = rollup(domain)
+            counts[domain] = counts.get(domain, 0) + domain_info.get("count", 0)
+    return sorted(counts.items(), key=itemgetter(1), reverse=True)
+
@@ -0,0 +1,148 @@
+"""Streaming anomaly detection on per-device query and block rates."""
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+import math
+from typing import Any
+
+METRICS = ("queries", "blocked")
+
+# Exponential smoothing factor of the baseline mean and variance
+DEFAULT_ALPHA = 0.05
+# Samples needed before a device's baseline is trusted
+WARMUP_SAMPLES = 12
+# Floor on the standard deviation, in events per minute, so a device with a
+# perfectly flat baseline does not alert on a handful of extra queries
+MIN_STD = 1.0
+
+
+@dataclass(slots=True)
+class Anomaly:
+    """A device that just started behaving anomalously."""
+
+    device_id: str
+    metric: str
+    rate: float
+    baseline: float
+    z_score: float
+
+
+class AnomalyDetector:
+    """EWMA mean and variance of per-minute rates, per device slot and metric.
+
+    State lives in flat arrays indexed by slot * 2 + metric, so an update is
+    a few arithmetic operations per device and no per-device objects exist.
+    """
+
+    def __init__(self, threshold: float, alpha: float = DEFAULT_ALPHA) -> None:
+        """Initialize the detector."""
+        self.threshold = threshold
+        self.alpha = alpha
+        self._mean = array("d")
+        self._var = array("d")
+        self._z = array("d")
+        # Mean the latest rate was compared against, before it was folded in
+        self._baseline = array("d")
+        self._rate = array("d")
+        self._samples = array("I")
+        self._anomalous = bytearray()
+        # Baselines loaded from storage, waiting for their device to get a slot
+        self._restored: dict[str, list[float]] = {}
+
+    def resize(self, capacity: int) -> None:
+        """Grow the arrays to hold capacity slots."""
+        missing = capacity * len(METRICS) - len(self._mean)
+        if missing > 0:
+            self._mean.extend([0.0] * missing)
+            self._var.extend([0.0] * missing)
+            self._z.extend([0.0] * missing)
+            self._baseline.extend([0.0] * missing)
+            self._rate.extend([0.0] * missing)
+            self._samples.extend([0] * missing)
+            self._anomalous.extend(bytes(missing))
+
+    def reset(self, slot: int, device_id: str | None = None) -> None:
+        """Clear a slot, restoring the stored baseline of its new device."""
+        restored = self._restored.pop(device_id, None) if device_id else None
+        for metric in range(len(METRICS)):
+            index = slot * len(METRICS) + metric
+            if restored:
+                mean, var, samples = restored[metric * 3:metric * 3 + 3]
+            else:
+                mean, var, samples = 0.0, 0.0, 0
+            self._mean[index] = mean
+            self._var[index] = var
+            self._samples[index] = int(samples)
+            self._z[index] = 0.0
+            self._baseline[index] = mean
+            self._rate[index] = 0.0
+            self._anomalous[index] = 0
+
+    def update(self, slot: int, metric: int, rate: float) -> bool:
+        """Feed a per-minute rate, returning True when it just turned anomalous."""
+        index = slot * len(METRICS) + metric
+        mean = self._mean[index]
+        var = self._var[index]
+        samples = self._samples[index]
+
+        z_score = (rate - mean) / max(math.sqrt(var), MIN_STD) if samples else 0.0
+        anomalous = samples >= WARMUP_SAMPLES and z_score >= self.threshold
+        was_anomalous = self._anomalous[index]
+
+        # West's incremental update of the exponentially weighted variance
+        diff = rate - mean
+        increment = self.alpha * diff
+        self._mean[index] = mean + increment
+        self._var[index] = (1 - self.alpha) * (var + diff * increment)
+        self._samples[index] = samples + 1
+        self._z[index] = z_score
+        self._baseline[index] = mean
+        self._rate[index] = rate
+        self._anomalous[index] = anomalous
+        return anomalous and not was_anomalous
+
+    def is_anomalous(self, slot: int) -> bool:
+        """Return whether any metric of a slot is anomalous."""
+        start = slot * len(METRICS)
+        return any(self._anomalous[start:start + len(METRICS)])
+
+    def details(self, slot: int) -> dict[str, Any]:
+        """Return the current rate, baseline and z-score of each metric."""
+        details: dict[str, Any] = {}
+        for metric, name in enumerate(METRICS):
+            index = slot * len(METRICS) + metric
+            details[f"{name}_per_minute"] = round(self._rate[index], 2)
+            details[f"{name}_baseline"] = round(self._baseline[index], 2)
+            details[f"{name}_z_score"] = round(self._z[index], 2)
+        return details
+
+    def anomaly(self, slot: int, metric: int, device_id: str) -> Anomaly:
+        """Describe the current state of a slot's metric."""
+        index = slot * len(METRICS) + metric
+        return Anomaly(
+            device_id,
+            METRICS[metric],
+            round(self._rate[index], 2),
+            round(self._baseline[index], 2),
+            round(self._z[index], 2),
+        )
+
+    def as_dict(self, device_ids: dict[str, int]) -> dict[str, list[float]]:
+        """Return the baselines of the given devices for storage."""
+        stored: dict[str, list[float]] = {}
+        for device_id, slot in device_ids.items():
+            values: list[float] = []
+            for metric in range(len(METRICS)):
+                index = slot * len(METRICS) + metric
+                values.extend((self._mean[index], self._var[index], self._samples[index]))
+            stored[device_id] = values
+        return stored
+
+    def restore(self, stored: dict[str, list[float]]) -> None:
+        """Load stored baselines, applied when each device is next assigned a slot."""
+        self._restored = {
+            device_id: values
+            for device_id, values in stored.items()
+            if isinstance(values, list) and len(values) == 3 * len(METRICS)
+        }
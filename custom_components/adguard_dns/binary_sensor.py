@@ -8,12 +8,18 @@ from homeassistant.components.binary_sensor import (
     BinarySensorEntity,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import AdGuardDNSConfigEntry
-from .const import BINARY_SENSOR_TYPES, DOMAIN
+from .const import (
+    BINARY_SENSOR_TYPES,
+    DEVICE_BINARY_SENSOR_TYPES,
+    DEVICE_ENTITIES_ENABLED_DEFAULT,
+    DOMAIN,
+    SERVER_BINARY_SENSOR_TYPES,
+)
 from .coordinator import AdGuardDNSDataUpdateCoordinator
 
 
@@ -31,6 +37,34 @@ async def async_setup_entry(
 
     async_add_entities(entities)
 
+    known_devices: set[str] = set()
+    known_servers: set[str] = set()
+
+    @callback
+    def _async_add_record_sensors() -> None:
+        """Add binary sensors for devices and DNS servers seen for the first time."""
+        data = coordinator.data or {}
+        new_devices = data.get("device_counters", {}).keys() - known_devices
+        new_servers = data.get("server_aggregates", {}).keys() - known_servers
+        if not new_devices and not new_servers:
+            return
+        known_devices.update(new_devices)
+        known_servers.update(new_servers)
+        new_entities: list[BinarySensorEntity] = [
+            AdGuardDNSServerBinarySensor(coordinator, server_id, sensor_type)
+            for server_id in new_servers
+            for sensor_type in SERVER_BINARY_SENSOR_TYPES
+        ]
+        new_entities.extend(
+            AdGuardDNSDeviceBinarySensor(coordinator, device_id, sensor_type)
+            for device_id in new_devices
+            for sensor_type in DEVICE_BINARY_SENSOR_TYPES
+        )
+        async_add_entities(new_entities)
+
+    _async_add_record_sensors()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_record_sensors))
+
 
 class AdGuardDNSBinarySensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], BinarySensorEntity):
     """Representation of an AdGuard DNS binary sensor."""
@@ -71,6 +105,12 @@ class AdGuardDNSBinarySensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator],
 
         if self._sensor_type == "protection_enabled":
             return self.coordinator.data.get("protection_enabled", True)
+
+        if self._sensor_type == "anomaly_detected":
+            return any(
+                anomalous
+                for anomalous, _ in self.coordinator.data.get("device_anomalies", {}).values()
+            )
         
         return None
 
@@ -95,5 +135,142 @@ class AdGuardDNSBinarySensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator],
                 attributes["recent_block_rate"] = (
                     round((blocked_queries / total_queries) * 100, 2) if total_queries > 0 else 0
                 )
+
+            # The state is on while any server is protected, name the ones that are not
+            unprotected = [
+                self.coordinator.get_record("dns_servers", server_id).get("name", server_id)
+                for server_id, aggregate in self.coordinator.data.get("server_aggregates", {}).items()
+                if not aggregate["protection_enabled"]
+            ]
+            if unprotected:
+                attributes["unprotected_servers"] = unprotected
+
+        elif self._sensor_type == "anomaly_detected":
+            anomalous = [
+                device_id
+                for device_id, (is_anomalous, _) in self.coordinator.data.get(
+                    "device_anomalies", {}
+                ).items()
+                if is_anomalous
+            ]
+            if anomalous:
+                attributes["devices"] = [
+                    self.coordinator.get_record("devices", device_id).get("name", device_id)
+                    for device_id in anomalous
+                ]
         
         return attributes if attributes else None
+
+
+class AdGuardDNSServerBinarySensor(
+    CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], BinarySensorEntity
+):
+    """Protection or filtering state of a single DNS server."""
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        server_id: str,
+        sensor_type: str,
+    ) -> None:
+        """Initialize the binary sensor."""
+        super().__init__(coordinator)
+        self._server_id = server_id
+        self._sensor_type = sensor_type
+
+        server_name = coordinator.get_record("dns_servers", server_id).get("name", server_id)
+        self._attr_name = f"AdGuard DNS {server_name} {SERVER_BINARY_SENSOR_TYPES[sensor_type]['name']}"
+        self._attr_unique_id = f"{DOMAIN}_dns_server_{server_id}_{sensor_type}"
+        self._attr_icon = SERVER_BINARY_SENSOR_TYPES[sensor_type]["icon"]
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        server = self.coordinator.get_record("dns_servers", self._server_id)
+        return {
+            "identifiers": {(DOMAIN, f"dns_server_{self._server_id}")},
+            "name": server.get("name", self._server_id),
+            "manufacturer": "AdGuard DNS",
+            "model": "DNS Server",
+            "via_device": (DOMAIN, "adguard_dns"),
+        }
+
+    @property
+    def _aggregate(self) -> dict[str, Any] | None:
+        """Return this server's precomputed totals."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.get("server_aggregates", {}).get(self._server_id)
+
+    @property
+    def available(self) -> bool:
+        """Return if the coordinator is up and the server still exists."""
+        return super().available and self._aggregate is not None
+
+    @property
+    def is_on(self) -> bool | None:
+        """Return true if the setting is enabled on the server."""
+        aggregate = self._aggregate
+        return aggregate[self._sensor_type] if aggregate is not None else None
+
+
+class AdGuardDNSDeviceBinarySensor(
+    CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], BinarySensorEntity
+):
+    """Binary sensor flagging unusual query activity of one device."""
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        device_id: str,
+        sensor_type: str,
+    ) -> None:
+        """Initialize the binary sensor."""
+        super().__init__(coordinator)
+        self._device_id = device_id
+        self._sensor_type = sensor_type
+
+        device_name = coordinator.get_record("devices", device_id).get("name", device_id)
+        self._attr_name = f"AdGuard DNS {device_name} {DEVICE_BINARY_SENSOR_TYPES[sensor_type]['name']}"
+        self._attr_unique_id = f"{DOMAIN}_device_{device_id}_{sensor_type}"
+        self._attr_icon = DEVICE_BINARY_SENSOR_TYPES[sensor_type]["icon"]
+        self._attr_device_class = BinarySensorDeviceClass(
+            DEVICE_BINARY_SENSOR_TYPES[sensor_type]["device_class"]
+        )
+        self._attr_entity_registry_enabled_default = DEVICE_ENTITIES_ENABLED_DEFAULT
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        device = self.coordinator.get_record("devices", self._device_id)
+        return {
+            "identifiers": {(DOMAIN, f"device_{self._device_id}")},
+            "name": device.get("name", self._device_id),
+            "manufacturer": "AdGuard DNS",
+            "model": "Tracked Device",
+            "via_device": (DOMAIN, "adguard_dns"),
+        }
+
+    @property
+    def _anomaly(self) -> tuple[bool, dict[str, Any]] | None:
+        """Return this device's anomaly flag and details from the last refresh."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.get("device_anomalies", {}).get(self._device_id)
+
+    @property
+    def available(self) -> bool:
+        """Return if the device still exists."""
+        return super().available and self._anomaly is not None
+
+    @property
+    def is_on(self) -> bool | None:
+        """Return true if the device's query or block rate is anomalous."""
+        anomaly = self._anomaly
+        return anomaly[0] if anomaly is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the current rates and their baselines."""
+        anomaly = self._anomaly
+        return anomaly[1] if anomaly is not None else None
@@ -57,6 +57,12 @@ class AdGuardDNSButton(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], Butto
 
     async def async_press(self) -> None:
         """Handle the button press."""
+        if self._button_type == "refresh":
+            await self.coordinator.refresh_coalescer.async_refresh(
+                self.coordinator.options.get("refresh_groups")
+            )
+            return
+
         # Note: clear_query_log functionality is not available in the current AdGuard DNS API
         # This button is kept for future API updates
         self.hass.components.persistent_notification.async_create(
@@ -13,8 +13,28 @@ from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-
-from .const import DOMAIN, OAUTH_URL
+import homeassistant.helpers.config_validation as cv
+
+from .const import (
+    DEFAULT_ANOMALY_THRESHOLD,
+    DEFAULT_CONSIDER_HOME,
+    DEFAULT_OFFLOAD_THRESHOLD,
+    DEFAULT_QUERY_INDEX_WINDOW,
+    DEFAULT_REFRESH_COOLDOWN,
+    DOMAIN,
+    DOMAIN_AGGREGATION_MODES,
+    DOMAIN_AGGREGATION_RAW,
+    ENDPOINT_GROUPS,
+    MAX_ANOMALY_THRESHOLD,
+    MAX_CONSIDER_HOME,
+    MAX_OFFLOAD_THRESHOLD,
+    MAX_PROFILE_THRESHOLD,
+    MAX_QUERY_INDEX_WINDOW,
+    MAX_REFRESH_COOLDOWN,
+    MIN_ANOMALY_THRESHOLD,
+    OAUTH_URL,
+)
+from .device_filter import DEVICE_TYPES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -136,6 +156,17 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
         if user_input is not None:
             return self.async_create_entry(title="", data=user_input)
 
+        dns_servers = {}
+        if self.config_entry.state is config_entries.ConfigEntryState.LOADED:
+            dns_servers = {
+                server["id"]: server.get("name", server["id"])
+                for server in self.config_entry.runtime_data.get_records("dns_servers")
+                if server.get("id")
+            }
+        # Keep servers that are selected but no longer listed
+        for server_id in self.config_entry.options.get("track_dns_servers", []):
+            dns_servers.setdefault(server_id, server_id)
+
         return self.async_show_form(
             step_id="init",
             data_schema=vol.Schema(
@@ -144,6 +175,61 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         "update_interval",
                         default=self.config_entry.options.get("update_interval", 300),
                     ): vol.All(vol.Coerce(int), vol.Range(min=60, max=3600)),
+                    vol.Optional(
+                        "refresh_groups",
+                        default=self.config_entry.options.get("refresh_groups", ENDPOINT_GROUPS),
+                    ): cv.multi_select({group: group.replace("_", " ").capitalize() for group in ENDPOINT_GROUPS}),
+                    vol.Optional(
+                        "refresh_cooldown",
+                        default=self.config_entry.options.get("refresh_cooldown", DEFAULT_REFRESH_COOLDOWN),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_REFRESH_COOLDOWN)),
+                    vol.Optional(
+                        "query_index_window",
+                        default=self.config_entry.options.get("query_index_window", DEFAULT_QUERY_INDEX_WINDOW),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_QUERY_INDEX_WINDOW)),
+                    vol.Optional(
+                        "domain_aggregation",
+                        default=self.config_entry.options.get("domain_aggregation", DOMAIN_AGGREGATION_RAW),
+                    ): vol.In(DOMAIN_AGGREGATION_MODES),
+                    vol.Optional(
+                        "offload_threshold",
+                        default=self.config_entry.options.get("offload_threshold", DEFAULT_OFFLOAD_THRESHOLD),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_OFFLOAD_THRESHOLD)),
+                    vol.Optional(
+                        "anomaly_threshold",
+                        default=self.config_entry.options.get("anomaly_threshold", DEFAULT_ANOMALY_THRESHOLD),
+                    ): vol.All(
+                        vol.Coerce(float),
+                        vol.Range(min=MIN_ANOMALY_THRESHOLD, max=MAX_ANOMALY_THRESHOLD),
+                    ),
+                    vol.Optional(
+                        "profile_threshold",
+                        default=self.config_entry.options.get("profile_threshold", 0),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=MAX_PROFILE_THRESHOLD)),
+                    vol.Optional(
+                        "track_name_pattern",
+                        default=self.config_entry.options.get("track_name_pattern", ""),
+                    ): str,
+                    vol.Optional(
+                        "track_device_types",
+                        default=self.config_entry.options.get("track_device_types", []),
+                    ): cv.multi_select({device_type: device_type.replace("_", " ").capitalize() for device_type in DEVICE_TYPES}),
+                    vol.Optional(
+                        "track_dns_servers",
+                        default=self.config_entry.options.get("track_dns_servers", []),
+                    ): cv.multi_select(dns_servers),
+                    vol.Optional(
+                        "consider_home",
+                        default=self.config_entry.options.get("consider_home", DEFAULT_CONSIDER_HOME),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=MAX_CONSIDER_HOME)),
+                    vol.Optional(
+                        "track_min_queries",
+                        default=self.config_entry.options.get("track_min_queries", 0),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        "history",
+                        default=self.config_entry.options.get("history", False),
+                    ): bool,
                 }
             ),
         )
@@ -15,8 +15,84 @@ API_ENDPOINTS = {
     "devices": "/oapi/v1/devices",
     "dns_servers": "/oapi/v1/dns_servers",
     "dedicated_addresses": "/oapi/v1/dedicated_addresses/ipv4",
+    "query_log": "/oapi/v1/query_log",
+    "device_settings": "/oapi/v1/devices/{device_id}/settings",
+    "dns_server_settings": "/oapi/v1/dns_servers/{dns_server_id}/settings",
 }
 
+# Endpoint groups fetched on every poll, in fetch order
+ENDPOINT_GROUPS = ["account_limits", "devices", "dns_servers", "dedicated_addresses"]
+
+# Settings that can be toggled through switches and services, mapped to the
+# key path inside the "settings" object of a device or DNS server
+CONTROL_SETTINGS = {
+    "protection": ("protection_enabled",),
+    "filtering": ("filter_lists_settings", "enabled"),
+}
+
+# Settings endpoint for each controllable resource
+SETTINGS_ENDPOINTS = {
+    "devices": ("device_settings", "device_id"),
+    "dns_servers": ("dns_server_settings", "dns_server_id"),
+}
+
+# Where a DNS server's rules live in its settings
+USER_RULES_PATH = ("user_rules_settings", "rules")
+FILTER_LISTS_PATH = ("filter_lists_settings", "filter_list")
+
+# Number of query log entries requested per page
+QUERY_LOG_PAGE_SIZE = 1000
+
+# Upper bound on query log pages ingested into the local index per refresh
+MAX_QUERY_LOG_PAGES_PER_REFRESH = 100
+
+# Query log entries indexed between yields to the event loop
+QUERY_LOG_INGEST_CHUNK = 5000
+
+# Length of the locally indexed query log window, 0 disables the index
+DEFAULT_QUERY_INDEX_WINDOW = 0  # minutes
+MAX_QUERY_INDEX_WINDOW = 1440  # 24 hours
+
+# How domains are grouped in the top domain sensors
+DOMAIN_AGGREGATION_RAW = "raw"
+DOMAIN_AGGREGATION_REGISTRABLE = "registrable"
+DOMAIN_AGGREGATION_MODES = [DOMAIN_AGGREGATION_RAW, DOMAIN_AGGREGATION_REGISTRABLE]
+
+# Payload size from which a refresh's data model is built in the executor
+DEFAULT_OFFLOAD_THRESHOLD = 256  # KiB
+MAX_OFFLOAD_THRESHOLD = 65536  # KiB
+
+DEFAULT_CONSIDER_HOME = 600  # seconds
+MAX_CONSIDER_HOME = 86400  # 24 hours
+
+MAX_PROFILE_THRESHOLD = 300  # seconds
+MAX_PROFILE_REFRESHES = 10
+
+# z-score of a device's query or block rate above which it is anomalous
+DEFAULT_ANOMALY_THRESHOLD = 4.0
+MIN_ANOMALY_THRESHOLD = 2.0
+MAX_ANOMALY_THRESHOLD = 10.0
+
+# Storage of state kept across restarts, per config entry
+STORAGE_VERSION = 1
+STORAGE_KEY = f"{DOMAIN}.{{entry_id}}"
+STORAGE_SAVE_DELAY = 300  # seconds
+
+# On-disk query history, per config entry: bucket seconds and buckets kept by tier
+HISTORY_DIR = "history"
+HISTORY_TIERS = {
+    "1m": (60, 2880),  # 2 days
+    "1h": (3600, 1344),  # 8 weeks
+    "1d": (86400, 366),  # 1 year
+}
+
+# Maximum number of settings writes sent to the API at the same time
+MAX_CONCURRENT_WRITES = 4
+
+# Fleets can have thousands of devices, so per-device entities start out
+# disabled and users opt in per device
+DEVICE_ENTITIES_ENABLED_DEFAULT = False
+
 # Sensor Types
 SENSOR_TYPES = {
     "total_queries": {
@@ -56,6 +132,144 @@ SENSOR_TYPES = {
     },
 }
 
+# Rate Sensor Types, for the account and each device. index points into
+# the rate tuples built by RateTracker: every window of queries, then of blocks
+RATE_SENSOR_TYPES = {
+    "queries_rate_5m": {
+        "name": "Queries per Minute (5 min)",
+        "icon": "mdi:speedometer",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 0,
+    },
+    "queries_rate_1h": {
+        "name": "Queries per Minute (1 hour)",
+        "icon": "mdi:speedometer",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 1,
+    },
+    "queries_rate_24h": {
+        "name": "Queries per Minute (24 hours)",
+        "icon": "mdi:speedometer",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 2,
+    },
+    "blocked_rate_5m": {
+        "name": "Blocks per Minute (5 min)",
+        "icon": "mdi:shield-half-full",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 3,
+    },
+    "blocked_rate_1h": {
+        "name": "Blocks per Minute (1 hour)",
+        "icon": "mdi:shield-half-full",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 4,
+    },
+    "blocked_rate_24h": {
+        "name": "Blocks per Minute (24 hours)",
+        "icon": "mdi:shield-half-full",
+        "unit": "queries/min",
+        "state_class": "measurement",
+        "index": 5,
+    },
+}
+
+# Rate windows in seconds, in the order of RATE_SENSOR_TYPES
+RATE_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+# Samples kept per rate window, the window start is accurate to 1/size
+RATE_RING_SIZE = 60
+
+# Per-device Sensor Types, values come from the device_counters and
+# device_rates slices
+DEVICE_SENSOR_TYPES = {
+    "queries": {
+        "name": "Queries",
+        "icon": "mdi:dns",
+        "unit": "queries",
+        "state_class": "total_increasing",
+        "source": "device_counters",
+        "index": 0,
+    },
+    "blocked": {
+        "name": "Blocked Queries",
+        "icon": "mdi:shield-check",
+        "unit": "queries",
+        "state_class": "total_increasing",
+        "source": "device_counters",
+        "index": 1,
+    },
+    "blocked_percentage": {
+        "name": "Blocked Percentage",
+        "icon": "mdi:percent",
+        "unit": "%",
+        "state_class": "measurement",
+        "source": "device_counters",
+        "index": 2,
+    },
+    **{
+        sensor_type: {**description, "source": "device_rates"}
+        for sensor_type, description in RATE_SENSOR_TYPES.items()
+    },
+}
+
+# Per-DNS server Sensor Types, values come from the server_aggregates and
+# server_rules slices
+SERVER_SENSOR_TYPES = {
+    "device_count": {
+        "name": "Devices",
+        "icon": "mdi:devices",
+        "unit": "devices",
+        "state_class": "measurement",
+        "source": "server_aggregates",
+        "key": "device_count",
+    },
+    "queries": {
+        "name": "Queries",
+        "icon": "mdi:dns",
+        "unit": "queries",
+        "state_class": "total_increasing",
+        "source": "server_aggregates",
+        "key": "queries",
+    },
+    "blocked": {
+        "name": "Blocked Queries",
+        "icon": "mdi:shield-check",
+        "unit": "queries",
+        "state_class": "total_increasing",
+        "source": "server_aggregates",
+        "key": "blocked",
+    },
+    "blocked_percentage": {
+        "name": "Blocked Percentage",
+        "icon": "mdi:percent",
+        "unit": "%",
+        "state_class": "measurement",
+        "source": "server_aggregates",
+        "key": "blocked_percentage",
+    },
+    "user_rules": {
+        "name": "User Rules",
+        "icon": "mdi:format-list-checks",
+        "unit": "rules",
+        "state_class": "measurement",
+        "source": "server_rules",
+        "key": "total",
+    },
+    "filter_lists": {
+        "name": "Filter Lists",
+        "icon": "mdi:filter-variant",
+        "unit": "lists",
+        "state_class": "measurement",
+        "source": "server_rules",
+        "key": "filter_lists",
+    },
+}
+
 # Binary Sensor Types
 BINARY_SENSOR_TYPES = {
     "protection_enabled": {
@@ -63,11 +277,54 @@ BINARY_SENSOR_TYPES = {
         "icon": "mdi:shield",
         "device_class": None,
     },
+    "anomaly_detected": {
+        "name": "Anomaly Detected",
+        "icon": "mdi:alert-decagram",
+        "device_class": "problem",
+    },
+}
+
+# Per-device Binary Sensor Types
+DEVICE_BINARY_SENSOR_TYPES = {
+    "query_anomaly": {
+        "name": "Query Anomaly",
+        "icon": "mdi:alert-decagram",
+        "device_class": "problem",
+    },
+}
+
+# Per-DNS server Binary Sensor Types, values come from the server_aggregates slice
+SERVER_BINARY_SENSOR_TYPES = {
+    "protection_enabled": {
+        "name": "Protection Enabled",
+        "icon": "mdi:shield",
+    },
+    "filtering_enabled": {
+        "name": "Filtering Enabled",
+        "icon": "mdi:filter",
+    },
+}
+
+# Switch Types
+SWITCH_TYPES = {
+    "protection": {
+        "name": "Protection",
+        "icon": "mdi:shield",
+    },
+    "filtering": {
+        "name": "Filtering",
+        "icon": "mdi:filter",
+    },
 }
 
 # Button Types
 # Note: Clear Query Log functionality is not available in current AdGuard DNS API
-BUTTON_TYPES = {}
+BUTTON_TYPES = {
+    "refresh": {
+        "name": "Refresh Now",
+        "icon": "mdi:refresh",
+    },
+}
 
 # Device Tracker Types
 DEVICE_TRACKER_TYPES = {
@@ -82,5 +339,62 @@ DEFAULT_UPDATE_INTERVAL = 300  # 5 minutes
 MIN_UPDATE_INTERVAL = 60  # 1 minute
 MAX_UPDATE_INTERVAL = 3600  # 1 hour
 
+# Minimum time between on-demand refreshes of the same endpoint group
+DEFAULT_REFRESH_COOLDOWN = 30  # seconds
+MAX_REFRESH_COOLDOWN = 600  # 10 minutes
+
 # Platforms
-PLATFORMS = ["sensor", "binary_sensor", "device_tracker"]
\ No newline at end of file
+PLATFORMS = ["sensor", "binary_sensor", "button", "device_tracker", "switch"]
+
+# Services
+SERVICE_SET_PROTECTION = "set_protection"
+SERVICE_SET_FILTERING = "set_filtering"
+SERVICE_REFRESH = "refresh"
+SERVICE_EXPORT_QUERY_LOG = "export_query_log"
+SERVICE_SEARCH_QUERY_LOG = "search_query_log"
+SERVICE_PROFILE = "profile"
+
+# Service attributes
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DEVICE_ID = "device_id"
+ATTR_DNS_SERVER_ID = "dns_server_id"
+ATTR_ENABLED = "enabled"
+ATTR_GROUPS = "groups"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_FORMAT = "format"
+ATTR_FILENAME = "filename"
+ATTR_DOMAIN = "domain"
+ATTR_STATUS = "status"
+ATTR_WITHIN = "within"
+ATTR_LIMIT = "limit"
+ATTR_REFRESHES = "refreshes"
+
+# Query log export
+EXPORT_DIR = "exports"
+PROFILE_DIR = "profiles"
+EXPORT_FORMATS = ["ndjson", "csv"]
+EXPORT_CSV_FIELDS = [
+    "time_millis",
+    "device_id",
+    "domain",
+    "filtering_status",
+    "dns_request_type",
+    "dns_proto_type",
+    "client_ip",
+    "response_country",
+]
+
+# Events
+EVENT_EXPORT_PROGRESS = "adguard_dns_export_progress"
+EVENT_DEVICE_CHANGED = "adguard_dns_device_changed"
+EVENT_SERVER_CHANGED = "adguard_dns_server_changed"
+EVENT_ANOMALY = "adguard_dns_anomaly"
+EVENT_RULES_CHANGED = "adguard_dns_rules_changed"
+EVENT_PROFILE = "adguard_dns_profile"
+
+# Change event fired for each resource and the event data key holding the record ID
+CHANGE_EVENTS = {
+    "devices": (EVENT_DEVICE_CHANGED, "device_id"),
+    "dns_servers": (EVENT_SERVER_CHANGED, "dns_server_id"),
+}
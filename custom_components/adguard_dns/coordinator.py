@@ -2,21 +2,63 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
-from datetime import datetime, timedelta
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import monotonic
 from typing import Any
 
 import aiohttp
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
     API_BASE_URL,
     API_ENDPOINTS,
+    CHANGE_EVENTS,
+    CONTROL_SETTINGS,
+    DEFAULT_ANOMALY_THRESHOLD,
+    DEFAULT_CONSIDER_HOME,
+    DEFAULT_OFFLOAD_THRESHOLD,
+    DEFAULT_QUERY_INDEX_WINDOW,
+    DEFAULT_REFRESH_COOLDOWN,
     DOMAIN,
+    DOMAIN_AGGREGATION_REGISTRABLE,
+    ENDPOINT_GROUPS,
+    EVENT_ANOMALY,
+    EVENT_PROFILE,
+    EVENT_RULES_CHANGED,
+    HISTORY_DIR,
+    HISTORY_TIERS,
+    MAX_CONCURRENT_WRITES,
+    MAX_QUERY_LOG_PAGES_PER_REFRESH,
     OAUTH_URL,
+    PROFILE_DIR,
+    QUERY_LOG_INGEST_CHUNK,
+    QUERY_LOG_PAGE_SIZE,
+    SETTINGS_ENDPOINTS,
+    STORAGE_KEY,
+    STORAGE_SAVE_DELAY,
+    STORAGE_VERSION,
 )
+from .anomaly import Anomaly
+from .device_filter import DeviceFilter
+from .device_stats import DeviceStatistics, DeviceUpdate
+from .diff import RecordChange, SnapshotDiffer
+from .history import HistoryBatch, HistoryStore
+from .model import Snapshot, build_snapshot, get_setting
+from .profiling import ProfileRun, RefreshProfiler, timed
+from .public_suffix import load_public_suffix_trie, registrable_domain
+from .query_index import QueryLogIndex
+from .refresh import RefreshCoalescer
+from .rules import RuleIndex, RulesChange
+from .views import TABLES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -31,6 +73,8 @@ class AdGuardDNSDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         access_token: str,
         refresh_token: str,
         update_interval: timedelta,
+        options: Mapping[str, Any] | None = None,
+        entry_id: str | None = None,
     ) -> None:
         """Initialize."""
         super().__init__(
@@ -43,6 +87,70 @@ class AdGuardDNSDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         self.access_token = access_token
         self.refresh_token = refresh_token
         self._token_expires_at: datetime | None = None
+        self.options: Mapping[str, Any] = options or {}
+        self._domain_rollup = (
+            registrable_domain
+            if self.options.get("domain_aggregation") == DOMAIN_AGGREGATION_REGISTRABLE
+            else None
+        )
+        # Whether the public suffix trie behind the rollup has been loaded
+        self._domain_rollup_loaded = self._domain_rollup is not registrable_domain
+        self.refresh_coalescer = RefreshCoalescer(
+            self, self.options.get("refresh_cooldown", DEFAULT_REFRESH_COOLDOWN)
+        )
+        # Optimistically applied settings awaiting confirmation by a poll, keyed
+        # by (resource, record id, control), with the value and the monotonic
+        # time its write finished, None while the write is in flight
+        self._pending_settings: dict[tuple[str, str, str], tuple[bool, float | None]] = {}
+        query_index_window = self.options.get("query_index_window", DEFAULT_QUERY_INDEX_WINDOW)
+        self.query_index: QueryLogIndex | None = (
+            QueryLogIndex(query_index_window * 60) if query_index_window else None
+        )
+        self._record_indexes: dict[str, tuple[Any, dict[str, dict[str, Any]]]] = {}
+        self._differs = {resource: SnapshotDiffer() for resource in CHANGE_EVENTS}
+        self._pending_changes: dict[str, list[RecordChange]] = {}
+        # Builds share the differs, so only one may run at a time
+        self._build_lock = asyncio.Lock()
+        self._offload_threshold = (
+            self.options.get("offload_threshold", DEFAULT_OFFLOAD_THRESHOLD) * 1024
+        )
+        self.device_stats = DeviceStatistics(
+            self.options.get("anomaly_threshold", DEFAULT_ANOMALY_THRESHOLD),
+            self.options.get("consider_home", DEFAULT_CONSIDER_HOME),
+        )
+        self._pending_anomalies: list[Anomaly] = []
+        # State to keep across restarts, copied out of the statistics by the last build
+        self._stored_state: dict[str, Any] | None = None
+        self.rules = RuleIndex()
+        self.device_filter = DeviceFilter.from_options(self.options)
+        self.profiler = RefreshProfiler(self.options.get("profile_threshold", 0))
+        self._profile_run: ProfileRun | None = None
+        # Set once the profiled refresh has its data, so only the listener
+        # update publishing that data ends the run
+        self._profile_data_ready = False
+        self._pending_rule_changes: list[RulesChange] = []
+        # Per-device listeners by (data slice, device ID), notified only when
+        # that slice of the device changes
+        self._device_listeners: dict[tuple[str, str], list[CALLBACK_TYPE]] = {}
+        self._pending_device_updates: set[tuple[str, str]] = set()
+        self._device_listeners_available = True
+        self._store: Store[dict[str, Any]] | None = (
+            Store(hass, STORAGE_VERSION, STORAGE_KEY.format(entry_id=entry_id))
+            if entry_id
+            else None
+        )
+        self.history: HistoryStore | None = (
+            HistoryStore(Path(hass.config.path(DOMAIN, HISTORY_DIR, entry_id)), HISTORY_TIERS)
+            if self.options.get("history") and entry_id
+            else None
+        )
+        # Refresh activity waiting to be written to the history files
+        self._pending_history: list[HistoryBatch] = []
+        self._history_task: asyncio.Task[None] | None = None
+        # Websocket tables by name, with the data they were built from
+        self._views: dict[str, tuple[dict[str, Any], list[dict[str, Any]]]] = {}
+        # Changes found by the latest refresh that polled each resource
+        self.last_changes: dict[str, list[RecordChange]] = {}
 
     async def _refresh_access_token(self) -> None:
         """Refresh the access token using the refresh token."""
@@ -82,10 +190,29 @@ class AdGuardDNSDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             self._token_expires_at is None
             or datetime.now() >= self._token_expires_at - timedelta(minutes=5)
         ):
-            await self._refresh_access_token()
+            with timed(self._profile_run, "token refresh"):
+                await self._refresh_access_token()
 
-    async def _api_request(self, endpoint: str, params: dict[str, Any] | None = None) -> dict[str, Any]:
+    async def _api_request(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        method: str = "GET",
+        json_data: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
         """Make an API request to AdGuard DNS."""
+        body = await self._api_request_raw(endpoint, params, method, json_data)
+        # Writes may answer with an empty body
+        return json.loads(body) if body.strip() else {}
+
+    async def _api_request_raw(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        method: str = "GET",
+        json_data: dict[str, Any] | None = None,
+    ) -> bytes:
+        """Make an API request to AdGuard DNS, returning the undecoded body."""
         await self._ensure_valid_token()
         
         url = f"{API_BASE_URL}{endpoint}"
@@ -95,16 +222,20 @@ class AdGuardDNSDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
         }
 
         try:
-            async with self.session.get(url, headers=headers, params=params) as response:
-                if response.status == 200:
-                    return await response.json()
+            async with self.session.request(
+                method, url, headers=headers, params=params, json=json_data
+            ) as response:
+                if response.status in (200, 204):
+                    return await response.read()
                 elif response.status == 401:
                     # Token might be invalid, try refreshing once
                     await self._refresh_access_token()
                     headers["Authorization"] = f"Bearer {self.access_token}"
-                    async with self.session.get(url, headers=headers, params=params) as retry_response:
-                        if retry_response.status == 200:
-                            return await retry_response.json()
+                    async with self.session.request(
+                        method, url, headers=headers, params=params, json=json_data
+                    ) as retry_response:
+                        if retry_response.status in (200, 204):
+                            return await retry_response.read()
                         else:
                             error_text = await retry_response.text()
                             _LOGGER.error(
@@ -123,82 +254,616 @@ class AdGuardDNSDataUpdateCoordinator(DataUpdateCoordinator[dict[str, Any]]):
             _LOGGER.error("Network error during API request: %s", err)
             raise UpdateFailed(f"Network error: {err}") from err
 
-    async def _fetch_account_limits(self) -> dict[str, Any]:
-        """Fetch account limits."""
-        return await self._api_request(API_ENDPOINTS["account_limits"])
+    async def async_fetch_query_log_page(
+        self, time_from: datetime, time_to: datetime, cursor: str | None = None
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """Fetch one page of the query log, returning its items and the next cursor."""
+        params: dict[str, Any] = {
+            "time_from_millis": int(time_from.timestamp() * 1000),
+            "time_to_millis": int(time_to.timestamp() * 1000),
+            "limit": QUERY_LOG_PAGE_SIZE,
+        }
+        if cursor:
+            params["cursor"] = cursor
+        response = await self._api_request(API_ENDPOINTS["query_log"], params)
+        return response.get("items", []), response.get("pages", {}).get("next")
 
-    async def _fetch_devices_list(self) -> dict[str, Any]:
-        """Fetch devices list."""
-        return await self._api_request(API_ENDPOINTS["devices"])
+    async def _async_ingest_query_log(self) -> None:
+        """Feed the query log entries logged since the last refresh into the index."""
+        index = self.query_index
+        assert index is not None
+        now = datetime.now(timezone.utc)
+        time_from = max(
+            now - timedelta(seconds=index.window),
+            # Entries sharing the last indexed millisecond were already ingested
+            datetime.fromtimestamp(index.last_time + 0.001, timezone.utc),
+        )
 
-    async def _fetch_dns_servers(self) -> dict[str, Any]:
-        """Fetch DNS servers list."""
-        return await self._api_request(API_ENDPOINTS["dns_servers"])
+        items: list[dict[str, Any]] = []
+        cursor = None
+        for _ in range(MAX_QUERY_LOG_PAGES_PER_REFRESH):
+            page, cursor = await self.async_fetch_query_log_page(time_from, now, cursor)
+            items.extend(page)
+            if not cursor or not page:
+                break
+        else:
+            _LOGGER.warning(
+                "Query log grew by more than %s pages since the last refresh, "
+                "the local index will miss some entries",
+                MAX_QUERY_LOG_PAGES_PER_REFRESH,
+            )
 
-    async def _fetch_dedicated_addresses(self) -> dict[str, Any]:
-        """Fetch dedicated IPv4 addresses."""
-        return await self._api_request(API_ENDPOINTS["dedicated_addresses"])
+        # Pages may come newest first, so sort everything before adding it.
+        # Websocket searches read the index on the event loop, so it is
+        # filled there in chunks rather than in the executor.
+        items.sort(key=lambda item: item.get("time_millis", 0))
+        for start in range(0, len(items), QUERY_LOG_INGEST_CHUNK):
+            index.add_items(items[start:start + QUERY_LOG_INGEST_CHUNK])
+            await asyncio.sleep(0)
+        index.evict(now.timestamp())
+
+    async def _async_fetch_groups(self, groups: Iterable[str]) -> dict[str, bytes | BaseException]:
+        """Fetch endpoint groups concurrently, returning raw bodies or exceptions."""
+        groups = list(groups)
+        run = self._profile_run
+        results = await asyncio.gather(
+            *(
+                self._api_request_raw(API_ENDPOINTS[group])
+                if run is None
+                else self._async_fetch_timed(run, group)
+                for group in groups
+            ),
+            return_exceptions=True,
+        )
+        return dict(zip(groups, results))
+
+    async def _async_fetch_timed(self, run: ProfileRun, group: str) -> bytes:
+        """Fetch an endpoint group, timing it as its own phase."""
+        with run.phase(f"fetch {group}"):
+            return await self._api_request_raw(API_ENDPOINTS[group])
+
+    async def _async_load_domain_rollup(self) -> None:
+        """Load the public suffix trie in the executor before it is first used."""
+        if not self._domain_rollup_loaded:
+            await self.hass.async_add_executor_job(load_public_suffix_trie)
+            self._domain_rollup_loaded = True
+
+    async def _async_build_snapshot(
+        self,
+        raw_results: dict[str, bytes | BaseException],
+        fetched_at: float,
+        previous: dict[str, Any] | None = None,
+    ) -> Snapshot:
+        """Build the data model from raw bodies, in the executor for large payloads.
+
+        Decoding, aggregation and diffing run as one job, so the event loop
+        only swaps in the finished snapshot. fetched_at is the monotonic time
+        the fetch of the raw bodies started.
+        """
+        await self._async_load_domain_rollup()
+        size = sum(len(body) for body in raw_results.values() if isinstance(body, bytes))
+        now = datetime.now(timezone.utc).timestamp()
+        run = self._profile_run
+        with timed(run, "build"):
+            if size >= self._offload_threshold:
+                _LOGGER.debug("Building %s byte payload in the executor", size)
+                build = run.wrap(self._build_snapshot) if run else self._build_snapshot
+                snapshot, device_update, rule_changes = await self.hass.async_add_executor_job(
+                    build, previous, raw_results, now, run
+                )
+            else:
+                snapshot, device_update, rule_changes = self._build_snapshot(
+                    previous, raw_results, now, run
+                )
+        self._apply_snapshot(snapshot, device_update, now, fetched_at)
+        if rule_changes:
+            self._pending_rule_changes.extend(rule_changes)
+        return snapshot
+
+    def _build_snapshot(
+        self,
+        previous: dict[str, Any] | None,
+        raw_results: dict[str, bytes | BaseException],
+        now: float,
+        run: ProfileRun | None = None,
+    ) -> tuple[Snapshot, DeviceUpdate | None, list[RulesChange] | None]:
+        """Build the data model and update the per-device statistics and rules."""
+        snapshot = build_snapshot(
+            previous, raw_results, self._differs, self._domain_rollup, run
+        )
+        device_update = None
+        if "devices" in snapshot.succeeded:
+            with timed(run, "device statistics"):
+                device_update = self.device_stats.update(
+                    snapshot.data["devices"].get("devices", []), now
+                )
+            # The snapshot is not published yet, so its data can still be extended
+            snapshot.data["rates"] = device_update.account_rates
+            snapshot.data["device_rates"] = device_update.rates
+            snapshot.data["device_presence"] = device_update.presence
+            snapshot.data["device_anomalies"] = device_update.anomaly_state
+            snapshot.data["tracked_devices"] = self.device_filter.select(
+                snapshot.data["devices"].get("devices", []), snapshot.data["device_counters"]
+            )
+        rule_changes = None
+        if "dns_servers" in snapshot.succeeded:
+            with timed(run, "rules"):
+                rule_changes = self.rules.update(
+                    snapshot.data["dns_servers"].get("dns_servers", [])
+                )
+            snapshot.data["server_rules"] = self.rules.counts()
+        return snapshot, device_update, rule_changes
+
+    def _apply_snapshot(
+        self,
+        snapshot: Snapshot,
+        device_update: DeviceUpdate | None,
+        now: float,
+        fetched_at: float,
+    ) -> None:
+        """Run the bookkeeping that follows a successful build."""
+        self._reconcile_pending_settings(snapshot.data, snapshot.succeeded, fetched_at)
+        self.refresh_coalescer.mark_refreshed(snapshot.succeeded)
+        self._pending_changes.update(snapshot.changes)
+        if device_update is not None:
+            self._pending_anomalies.extend(device_update.anomalies)
+            self._pending_device_updates.update(
+                ("device_counters", device_id) for device_id in device_update.changed
+            )
+            self._pending_device_updates.update(
+                ("device_rates", device_id) for device_id in device_update.rates_changed
+            )
+            self._stored_state = device_update.stored
+            if self._store is not None:
+                self._store.async_delay_save(self._get_stored_state, STORAGE_SAVE_DELAY)
+            if self.history is not None:
+                self._pending_history.append(HistoryBatch(now, device_update.activity))
+                self._async_schedule_history_write()
+        elif not snapshot.data.get("device_counters"):
+            # Devices failed to load, per-device entities become unavailable
+            self._pending_device_updates.update(self._device_listeners)
+
+    @callback
+    def _get_stored_state(self) -> dict[str, Any]:
+        """Return the state kept across restarts, as of the last build."""
+        assert self._stored_state is not None
+        return self._stored_state
+
+    async def async_save_state(self) -> None:
+        """Save the state kept across restarts right away."""
+        if self._store is not None and self._stored_state is not None:
+            await self._store.async_save(self._stored_state)
+
+    async def async_load_state(self) -> None:
+        """Load the state kept across restarts."""
+        if self._store is not None and (stored := await self._store.async_load()):
+            self.device_stats.restore(stored)
+        if self.history is not None:
+            try:
+                await self.hass.async_add_executor_job(self.history.open)
+            except OSError as err:
+                _LOGGER.error("Failed to open the query history, it is disabled: %s", err)
+                self.history = None
+
+    @callback
+    def _async_schedule_history_write(self) -> None:
+        """Start writing pending history unless a write is already running."""
+        if self._history_task is None or self._history_task.done():
+            self._history_task = self.hass.async_create_background_task(
+                self._async_write_history(), f"{DOMAIN} history write"
+            )
+
+    async def _async_write_history(self) -> None:
+        """Write pending history in the executor.
+
+        Refreshes that finish while a write runs are batched into the next one.
+        """
+        while self._pending_history and self.history is not None:
+            batches, self._pending_history = self._pending_history, []
+            try:
+                await self.hass.async_add_executor_job(self.history.write, batches)
+            except OSError as err:
+                _LOGGER.error("Failed to write the query history: %s", err)
+
+    async def async_read_history(
+        self, tier: str, device_id: str | None, start: float, end: float
+    ) -> list[list[int]] | None:
+        """Return the history buckets of the account or a device, None if unknown."""
+        if self.history is None:
+            raise HomeAssistantError("Query history is not enabled")
+        return await self.hass.async_add_executor_job(
+            self.history.read, tier, device_id, start, end
+        )
+
+    async def async_close_history(self) -> None:
+        """Write pending history and close the history files."""
+        if self.history is None:
+            return
+        if self._history_task is not None:
+            await self._history_task
+        history, self.history = self.history, None
+        await self.hass.async_add_executor_job(history.close)
 
     async def _async_update_data(self) -> dict[str, Any]:
         """Fetch data from API endpoint."""
+        run = self._async_start_profile()
         try:
-            # Fetch all data concurrently
-            api_tasks = [
-                self._fetch_account_limits(),
-                self._fetch_devices_list(),
-                self._fetch_dns_servers(),
-                self._fetch_dedicated_addresses(),
-            ]
-            
-            results = await asyncio.gather(*api_tasks, return_exceptions=True)
-            
-            data = {}
-            
-            # Process account limits
-            if isinstance(results[0], dict):
-                data["account_limits"] = results[0]
-            else:
-                _LOGGER.warning("Failed to fetch account limits: %s", results[0])
-                data["account_limits"] = {}
-            
-            # Process devices
-            if isinstance(results[1], dict):
-                data["devices"] = results[1]
-                # Calculate basic stats from devices
-                devices_list = results[1].get("devices", [])
-                data["total_queries"] = sum(device.get("queries_count", 0) for device in devices_list)
-                data["blocked_queries"] = sum(device.get("blocked_count", 0) for device in devices_list)
-                if data["total_queries"] > 0:
-                    data["blocked_percentage"] = round((data["blocked_queries"] / data["total_queries"]) * 100, 2)
-                else:
-                    data["blocked_percentage"] = 0
-            else:
-                _LOGGER.warning("Failed to fetch devices: %s", results[1])
-                data["devices"] = {}
-                data["total_queries"] = 0
-                data["blocked_queries"] = 0
-                data["blocked_percentage"] = 0
-            
-            # Process DNS servers
-            if isinstance(results[2], dict):
-                data["dns_servers"] = results[2]
-                # Determine protection status from DNS servers
-                dns_servers = results[2].get("dns_servers", [])
-                data["protection_enabled"] = any(server.get("settings", {}).get("protection_enabled", False) for server in dns_servers)
-            else:
-                _LOGGER.warning("Failed to fetch DNS servers: %s", results[2])
-                data["dns_servers"] = {}
-                data["protection_enabled"] = True  # Default to enabled
+            # Fetch all data concurrently, letting on-demand refreshes join in
+            with self.refresh_coalescer.in_flight(ENDPOINT_GROUPS):
+                fetched_at = monotonic()
+                raw_results = await self._async_fetch_groups(ENDPOINT_GROUPS)
+
+                async with self._build_lock:
+                    snapshot = await self._async_build_snapshot(raw_results, fetched_at)
             
-            # Process dedicated addresses
-            if isinstance(results[3], dict):
-                data["dedicated_addresses"] = results[3]
-            else:
-                _LOGGER.warning("Failed to fetch dedicated addresses: %s", results[3])
-                data["dedicated_addresses"] = {}
+            if self.query_index is not None:
+                try:
+                    with timed(self._profile_run, "query log"):
+                        await self._async_ingest_query_log()
+                except UpdateFailed as err:
+                    _LOGGER.warning("Failed to update the query log index: %s", err)
             
-            return data
+            # Unless a later refresh has taken over the profiler
+            self._profile_data_ready = run is not None and run is self._profile_run
+            return snapshot.data
             
         except Exception as err:
             _LOGGER.error("Error fetching data: %s", err)
-            raise UpdateFailed(f"Error fetching data: {err}") from err
\ No newline at end of file
+            if run is not None and run is self._profile_run:
+                self._async_finish_profile()
+            raise UpdateFailed(f"Error fetching data: {err}") from err
+
+    async def async_refresh_groups(self, groups: Iterable[str]) -> None:
+        """Refresh selected endpoint groups without a full update.
+
+        Requesting every group runs a regular coordinator refresh. A subset
+        is merged into the current data, keeping the previous value of any
+        group that fails, and leaves the polling schedule untouched.
+        """
+        groups = [group for group in ENDPOINT_GROUPS if group in set(groups)]
+        if len(groups) == len(ENDPOINT_GROUPS) or not self.data:
+            await self.async_refresh()
+            return
+
+        run = self._async_start_profile()
+        try:
+            fetched_at = monotonic()
+            raw_results = await self._async_fetch_groups(groups)
+            async with self._build_lock:
+                snapshot = await self._async_build_snapshot(raw_results, fetched_at, self.data)
+                self.data = snapshot.data
+        except BaseException:
+            if run is not None and run is self._profile_run:
+                self._async_finish_profile()
+            raise
+        self._profile_data_ready = run is not None and run is self._profile_run
+        self.async_update_listeners()
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update listeners, then fire change events for the new data.
+
+        Events go out after entities have written their new state, so
+        automations triggered by them see consistent states. Updates made
+        while a profiled refresh is still fetching, such as optimistic
+        writes, are not part of its profile.
+        """
+        run = self._profile_run if self._profile_data_ready else None
+        with timed(run, "entity writes"):
+            super().async_update_listeners()
+            self._async_update_device_listeners()
+        with timed(run, "events"):
+            self._async_fire_events()
+        if run is not None:
+            self._async_finish_profile()
+
+    @callback
+    def _async_fire_events(self) -> None:
+        """Fire the events queued by the latest refresh."""
+        if self._pending_anomalies:
+            anomalies, self._pending_anomalies = self._pending_anomalies, []
+            for anomaly in anomalies:
+                self.hass.bus.async_fire(EVENT_ANOMALY, asdict(anomaly))
+        if self._pending_rule_changes:
+            rule_changes, self._pending_rule_changes = self._pending_rule_changes, []
+            for rule_change in rule_changes:
+                self.hass.bus.async_fire(EVENT_RULES_CHANGED, rule_change.as_event_data())
+        if not self._pending_changes:
+            return
+
+        pending, self._pending_changes = self._pending_changes, {}
+        for resource, changes in pending.items():
+            self.last_changes[resource] = changes
+            event_type, id_key = CHANGE_EVENTS[resource]
+            for change in changes:
+                self.hass.bus.async_fire(
+                    event_type, {id_key: change.record_id, **change.as_event_data()}
+                )
+
+    @callback
+    def _async_start_profile(self) -> ProfileRun | None:
+        """Start profiling a refresh if the profiler wants it, returning its run."""
+        if self._profile_run is not None:
+            # A previous refresh ended without reaching the listeners
+            self._async_finish_profile()
+        self._profile_run = self.profiler.start()
+        return self._profile_run
+
+    @callback
+    def _async_finish_profile(self) -> None:
+        """Finish the profiled refresh, reporting it if it is worth it."""
+        run, self._profile_run = self._profile_run, None
+        self._profile_data_ready = False
+        if run is None:
+            return
+        if reason := self.profiler.finish(run):
+            self.hass.async_create_task(self._async_report_profile(run, reason))
+
+    async def _async_report_profile(self, run: ProfileRun, reason: str) -> None:
+        """Write a refresh profile to the config directory and announce it."""
+        directory = Path(self.hass.config.path(DOMAIN, PROFILE_DIR))
+        try:
+            path = await self.hass.async_add_executor_job(run.write, directory, reason)
+        except OSError as err:
+            _LOGGER.error("Failed to write refresh profile: %s", err)
+            return
+        summary = run.summary()
+        _LOGGER.warning(
+            "Refresh took %s ms (%s), profile written to %s", summary["duration"], reason, path
+        )
+        self.hass.bus.async_fire(EVENT_PROFILE, {"path": str(path), "reason": reason, **summary})
+
+    @callback
+    def async_add_device_listener(
+        self, device_id: str, update_callback: CALLBACK_TYPE, source: str = "device_counters"
+    ) -> Callable[[], None]:
+        """Listen for updates of a single device's counters or rates.
+
+        source is the data slice the listener reads, device_counters or
+        device_rates.
+        """
+        key = (source, device_id)
+        listeners = self._device_listeners.setdefault(key, [])
+        listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            listeners.remove(update_callback)
+            if not listeners:
+                self._device_listeners.pop(key, None)
+
+        return remove_listener
+
+    @callback
+    def _async_update_device_listeners(self) -> None:
+        """Notify the listeners of changed devices.
+
+        Every device listener is notified when availability flips, since
+        all per-device entities follow the coordinator's availability.
+        """
+        pending, self._pending_device_updates = self._pending_device_updates, set()
+        if self.last_update_success != self._device_listeners_available:
+            self._device_listeners_available = self.last_update_success
+            pending = self._device_listeners.keys()
+        for key in list(pending):
+            for update_callback in list(self._device_listeners.get(key, ())):
+                update_callback()
+
+    def get_view(self, table: str) -> list[dict[str, Any]]:
+        """Return the rows of a websocket table, built once per data update."""
+        data = self.data or {}
+        cached = self._views.get(table)
+        if cached is None or cached[0] is not data:
+            cached = self._views[table] = (data, TABLES[table][0](data))
+        return cached[1]
+
+    def get_records(self, resource: str) -> list[dict[str, Any]]:
+        """Return the device or DNS server records from the current data."""
+        if not self.data:
+            return []
+        return self.data.get(resource, {}).get(resource, [])
+
+    def get_record(self, resource: str, record_id: str) -> dict[str, Any]:
+        """Return a single device or DNS server record by ID."""
+        payload = self.data.get(resource) if self.data else None
+        cached = self._record_indexes.get(resource)
+        if cached is None or cached[0] is not payload:
+            index = {
+                record["id"]: record
+                for record in self.get_records(resource)
+                if record.get("id")
+            }
+            cached = (payload, index)
+            self._record_indexes[resource] = cached
+        return cached[1].get(record_id, {})
+
+    async def async_set_control(
+        self, resource: str, control: str, enabled: bool, record_ids: Iterable[str]
+    ) -> None:
+        """Toggle a control setting on many devices or DNS servers at once.
+
+        The change is applied to the coordinator data straight away and the
+        writes are fanned out with bounded concurrency. Failed or cancelled
+        writes are rolled back unless a poll or another call changed the
+        setting in the meantime; successful ones are confirmed by the first
+        poll fetched after they finished.
+        """
+        record_ids = [
+            record_id for record_id in dict.fromkeys(record_ids)
+            if self.get_record(resource, record_id)
+        ]
+        if not record_ids:
+            return
+
+        path = CONTROL_SETTINGS[control]
+        previous = self._apply_settings(
+            resource, path, {record_id: enabled for record_id in record_ids}
+        )
+        for record_id in record_ids:
+            self._pending_settings[(resource, record_id, control)] = (enabled, None)
+        self.async_update_listeners()
+
+        endpoint_key, id_key = SETTINGS_ENDPOINTS[resource]
+        body = _nest(path, enabled)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_WRITES)
+
+        async def _write(record_id: str) -> None:
+            async with semaphore:
+                await self._api_request(
+                    API_ENDPOINTS[endpoint_key].format(**{id_key: record_id}),
+                    method="PUT",
+                    json_data=body,
+                )
+
+        cancelled = False
+        try:
+            results: list[Any] = await asyncio.gather(
+                *(_write(record_id) for record_id in record_ids), return_exceptions=True
+            )
+        except asyncio.CancelledError:
+            # Writes that did not finish are unknown, treat them all as failed
+            cancelled = True
+            results = [asyncio.CancelledError()] * len(record_ids)
+
+        written_at = monotonic()
+        failed = {}
+        for record_id, result in zip(record_ids, results):
+            key = (resource, record_id, control)
+            if isinstance(result, BaseException):
+                failed[record_id] = previous[record_id]
+            elif self._pending_settings.get(key) == (enabled, None):
+                self._pending_settings[key] = (enabled, written_at)
+        if not failed:
+            return
+
+        rollback = {}
+        for record_id, value in failed.items():
+            key = (resource, record_id, control)
+            current = get_setting(self.get_record(resource, record_id).get("settings", {}), path)
+            if self._pending_settings.get(key) != (enabled, None) or current != enabled:
+                # A poll or a later call already replaced the optimistic value
+                continue
+            del self._pending_settings[key]
+            rollback[record_id] = value
+        if rollback:
+            self._apply_settings(resource, path, rollback)
+            self.async_update_listeners()
+        if cancelled:
+            raise asyncio.CancelledError
+        # Concurrent writes to the same records may have landed, let a poll settle them
+        await self.refresh_coalescer.async_refresh([resource])
+        raise HomeAssistantError(
+            f"Failed to update {control} for {len(failed)} of {len(record_ids)} "
+            f"{resource.replace('_', ' ')}: {', '.join(failed)}"
+        )
+
+    def _apply_settings(
+        self, resource: str, path: tuple[str, ...], values: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Write setting values into the coordinator data, returning the old ones."""
+        self.data, previous = _with_settings(self.data, resource, path, values)
+        return previous
+
+    def _reconcile_pending_settings(
+        self, data: dict[str, Any], succeeded: frozenset[str], fetched_at: float
+    ) -> None:
+        """Confirm or roll back optimistic settings against freshly polled data.
+
+        Settings whose write had not finished when the fetch started may be
+        missing from the data, so they are written over it and stay pending.
+        """
+        if not self._pending_settings:
+            return
+
+        unconfirmed: dict[tuple[str, tuple[str, ...]], dict[str, bool]] = {}
+        indexes: dict[str, dict[str, dict[str, Any]]] = {}
+        for key, (enabled, written_at) in list(self._pending_settings.items()):
+            resource, record_id, control = key
+            if resource not in succeeded:
+                # Not polled this time, keep waiting for confirmation
+                continue
+            if written_at is None or written_at > fetched_at:
+                unconfirmed.setdefault((resource, CONTROL_SETTINGS[control]), {})[
+                    record_id
+                ] = enabled
+                continue
+            del self._pending_settings[key]
+            if resource not in indexes:
+                indexes[resource] = {
+                    record.get("id"): record
+                    for record in data.get(resource, {}).get(resource, [])
+                }
+            record = indexes[resource].get(record_id)
+            if record is None:
+                continue
+            actual = get_setting(record.get("settings", {}), CONTROL_SETTINGS[control])
+            if actual == enabled:
+                _LOGGER.debug("Confirmed %s=%s for %s %s", control, enabled, resource, record_id)
+            else:
+                _LOGGER.warning(
+                    "AdGuard DNS did not apply %s=%s for %s %s, rolled back to %s",
+                    control,
+                    enabled,
+                    resource,
+                    record_id,
+                    actual,
+                )
+
+        # The snapshot is not published yet, so its data can still be updated
+        for (resource, path), values in unconfirmed.items():
+            data.update(_with_settings(data, resource, path, values)[0])
+
+
+def _with_settings(
+    data: dict[str, Any], resource: str, path: tuple[str, ...], values: dict[str, Any]
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Return a copy of the data with setting values written, and the old values.
+
+    Only the touched records are copied so entities holding the previous
+    payload never see it change underneath them.
+    """
+    previous: dict[str, Any] = {}
+    records = []
+    for record in data.get(resource, {}).get(resource, []):
+        record_id = record.get("id")
+        if record_id in values:
+            settings = record.get("settings", {})
+            previous[record_id] = get_setting(settings, path)
+            record = {
+                **record,
+                "settings": _with_path(settings, path, values[record_id]),
+            }
+        records.append(record)
+
+    payload = data.get(resource, {})
+    data = {**data, resource: {**payload, resource: records}}
+    if resource == "dns_servers" and (aggregates := data.get("server_aggregates")):
+        # Keep the per-server flags in step with the written settings
+        key = next(
+            f"{control}_enabled"
+            for control, control_path in CONTROL_SETTINGS.items()
+            if control_path == path
+        )
+        data["server_aggregates"] = {
+            **aggregates,
+            **{
+                server_id: {**aggregates[server_id], key: bool(value)}
+                for server_id, value in values.items()
+                if server_id in aggregates
+            },
+        }
+    return data, previous
+
+
+def _with_path(settings: dict[str, Any], path: tuple[str, ...], value: Any) -> dict[str, Any]:
+    """Return a copy of a settings dict with the value at a key path replaced."""
+    head, *rest = path
+    if not rest:
+        return {**settings, head: value}
+    child = settings.get(head)
+    return {**settings, head: _with_path(child if isinstance(child, dict) else {}, tuple(rest), value)}
+
+
+def _nest(path: tuple[str, ...], value: Any) -> dict[str, Any]:
+    """Build the request body for a settings update at a key path."""
+    return _with_path({}, path, value)
@@ -0,0 +1,85 @@
+"""Selection of the devices that get a device tracker."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from fnmatch import translate
+import re
+from typing import Any
+
+# Device types reported by the AdGuard DNS API
+DEVICE_TYPES = [
+    "WINDOWS",
+    "ANDROID",
+    "MAC",
+    "IOS",
+    "LINUX",
+    "ROUTER",
+    "SMART_TV",
+    "GAME_CONSOLE",
+    "UNKNOWN",
+]
+
+
+class DeviceFilter:
+    """Match devices against the tracking options.
+
+    The options are compiled once: name patterns into a single regular
+    expression and the other criteria into sets, so checking a device is
+    a few lookups.
+    """
+
+    def __init__(
+        self,
+        name_patterns: Iterable[str] = (),
+        device_types: Iterable[str] = (),
+        dns_server_ids: Iterable[str] = (),
+        min_queries: int = 0,
+    ) -> None:
+        """Compile the filter."""
+        patterns = [pattern.strip() for pattern in name_patterns if pattern.strip()]
+        self._name = (
+            re.compile("|".join(translate(pattern) for pattern in patterns), re.IGNORECASE)
+            if patterns
+            else None
+        )
+        self._types = frozenset(device_types)
+        self._servers = frozenset(dns_server_ids)
+        self._min_queries = min_queries
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> DeviceFilter:
+        """Build the filter from config entry options."""
+        return cls(
+            options.get("track_name_pattern", "").split(","),
+            options.get("track_device_types", ()),
+            options.get("track_dns_servers", ()),
+            options.get("track_min_queries", 0),
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        """Return whether every device matches."""
+        return not (self._name or self._types or self._servers or self._min_queries)
+
+    def select(
+        self,
+        devices: Iterable[dict[str, Any]],
+        counters: Mapping[str, tuple[int, int, float]],
+    ) -> frozenset[str]:
+        """Return the IDs of the matching devices."""
+        if self.is_empty:
+            return frozenset(device["id"] for device in devices if device.get("id"))
+        selected = []
+        for device in devices:
+            if not (device_id := device.get("id")):
+                continue
+            if self._types and device.get("device_type", "UNKNOWN") not in self._types:
+                continue
+            if self._servers and device.get("dns_server_id") not in self._servers:
+                continue
+            if self._min_queries and counters.get(device_id, (0,))[0] < self._min_queries:
+                continue
+            if self._name and not self._name.match(device.get("name") or ""):
+                continue
+            selected.append(device_id)
+        return frozenset(selected)
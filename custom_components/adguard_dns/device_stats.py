@@ -0,0 +1,205 @@
+"""Per-device statistics kept in compact arrays indexed by device slot."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from .aggregation import get_counter
+from .anomaly import METRICS, Anomaly, AnomalyDetector
+from .const import RATE_RING_SIZE, RATE_WINDOWS
+from .rates import RateTracker
+
+
+class DeviceSlots:
+    """Assign stable array indexes to device IDs, reusing freed ones."""
+
+    def __init__(self) -> None:
+        """Initialize the slot map."""
+        self.index: dict[str, int] = {}
+        self.ids: list[str | None] = []
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        """Return the number of slots, including free ones."""
+        return len(self.ids)
+
+    def sync(self, device_ids: Iterable[str]) -> tuple[list[int], list[int]]:
+        """Match the slots to the current devices.
+
+        Returns the slots assigned to new devices and the slots freed by
+        devices that are gone, so per-slot state can be reset.
+        """
+        current = set(device_ids)
+        freed = [self.index.pop(device_id) for device_id in self.index.keys() - current]
+        for slot in freed:
+            self.ids[slot] = None
+        self._free.extend(freed)
+
+        added = []
+        for device_id in current - self.index.keys():
+            if self._free:
+                slot = self._free.pop()
+                self.ids[slot] = device_id
+            else:
+                slot = len(self.ids)
+                self.ids.append(device_id)
+            self.index[device_id] = slot
+            added.append(slot)
+        return added, freed
+
+
+@dataclass(slots=True)
+class DeviceUpdate:
+    """What a device statistics update produced."""
+
+    anomalies: list[Anomaly] = field(default_factory=list)
+    # Devices whose counters changed, appeared or disappeared
+    changed: list[str] = field(default_factory=list)
+    # Devices whose rates changed, appeared or disappeared
+    rates_changed: list[str] = field(default_factory=list)
+    # Rates of the account and by device ID, see RateTracker.update
+    account_rates: tuple[float | None, ...] = ()
+    rates: dict[str, tuple[float | None, ...]] = field(default_factory=dict)
+    # Whether each device is home, and when it last made a query, by device ID
+    presence: dict[str, tuple[bool, float | None]] = field(default_factory=dict)
+    # (device ID, queries, blocked) since the previous update, for active devices
+    activity: list[tuple[str, int, int]] = field(default_factory=list)
+    # Whether each device is anomalous, and its rates and baselines, by device ID
+    anomaly_state: dict[str, tuple[bool, dict[str, Any]]] = field(default_factory=dict)
+    # The state worth keeping across restarts, see DeviceStatistics.as_dict
+    stored: dict[str, Any] = field(default_factory=dict)
+
+
+class DeviceStatistics:
+    """Track per-device counters between refreshes.
+
+    Counter values and derived state live in flat arrays indexed by device
+    slot, and one update pass walks the device list once.
+    """
+
+    def __init__(self, anomaly_threshold: float, consider_home: float) -> None:
+        """Initialize the statistics."""
+        self.consider_home = consider_home
+        self.slots = DeviceSlots()
+        self.anomaly = AnomalyDetector(anomaly_threshold)
+        self.rates = RateTracker(RATE_WINDOWS, RATE_RING_SIZE)
+        self._last_rates: dict[str, tuple[float | None, ...]] = {}
+        self._counters = array("q")  # slot * len(METRICS) + metric
+        self._has_counters = bytearray()
+        self._last_seen = array("d")  # slot, 0 if never seen querying
+        # Last seen times loaded from storage, waiting for their device to get a slot
+        self._restored_last_seen: dict[str, float] = {}
+        self._last_update: float | None = None
+
+    def slot(self, device_id: str) -> int | None:
+        """Return the slot of a device."""
+        return self.slots.index.get(device_id)
+
+    def update(self, devices: Iterable[dict[str, Any]], now: float) -> DeviceUpdate:
+        """Fold the counters of a fresh device list into the per-slot state."""
+        devices = [device for device in devices if device.get("id")]
+        result = DeviceUpdate()
+        current = {device["id"] for device in devices}
+        result.changed.extend(device_id for device_id in self.slots.index if device_id not in current)
+        result.rates_changed.extend(result.changed)
+        added, freed = self.slots.sync(current)
+        self._resize(len(self.slots))
+        # A freed slot may already be reused by a new device
+        for slot in dict.fromkeys((*freed, *added)):
+            self._has_counters[slot] = 0
+            device_id = self.slots.ids[slot]
+            self._last_seen[slot] = self._restored_last_seen.pop(device_id, 0.0) if device_id else 0.0
+            self.anomaly.reset(slot, device_id)
+            self.rates.reset(slot + 1, now)
+
+        elapsed = None if self._last_update is None else (now - self._last_update) / 60
+        self._last_update = now
+        changed: set[str] = set()
+        totals = self.rates.totals
+        for device in devices:
+            slot = self.slots.index[device["id"]]
+            had_counters = self._has_counters[slot]
+            self._has_counters[slot] = 1
+            deltas = [0] * len(METRICS)
+            for metric, name in enumerate(METRICS):
+                index = slot * len(METRICS) + metric
+                value = get_counter(device, f"{name}_count")
+                previous = self._counters[index]
+                self._counters[index] = value
+                if value != previous or not had_counters:
+                    changed.add(device["id"])
+                if not had_counters:
+                    continue
+                if value < previous:
+                    # The API reset its counters, the new value is all fresh activity
+                    previous = 0
+                delta = value - previous
+                if delta:
+                    deltas[metric] = delta
+                    totals[(slot + 1) * len(METRICS) + metric] += delta
+                    totals[metric] += delta
+                    if metric == 0:
+                        self._last_seen[slot] = now
+                if elapsed and self.anomaly.update(slot, metric, delta / elapsed):
+                    result.anomalies.append(self.anomaly.anomaly(slot, metric, device["id"]))
+            if any(deltas):
+                result.activity.append((device["id"], *deltas))
+
+        device_ids = list(self.slots.index)
+        rates = self.rates.update(now, [0, *(self.slots.index[device_id] + 1 for device_id in device_ids)])
+        result.account_rates = rates[0]
+        result.rates = dict(zip(device_ids, rates[1:]))
+        result.rates_changed.extend(
+            device_id
+            for device_id, device_rates in result.rates.items()
+            if self._last_rates.get(device_id) != device_rates
+        )
+        self._last_rates = result.rates
+
+        # Presence comes from query activity, not from the API's status field
+        home_since = now - self.consider_home
+        last_seen = self._last_seen
+        for device_id in device_ids:
+            slot = self.slots.index[device_id]
+            seen = last_seen[slot]
+            result.presence[device_id] = (seen >= home_since, seen) if seen else (False, None)
+            result.anomaly_state[device_id] = (
+                self.anomaly.is_anomalous(slot),
+                self.anomaly.details(slot),
+            )
+        result.changed.extend(changed)
+        # Copied now, as the arrays keep changing in later updates
+        result.stored = self.as_dict()
+        return result
+
+    def _resize(self, capacity: int) -> None:
+        """Grow the arrays to hold capacity slots."""
+        missing = capacity - len(self._has_counters)
+        if missing > 0:
+            self._counters.extend([0] * (missing * len(METRICS)))
+            self._has_counters.extend(bytes(missing))
+            self._last_seen.extend([0.0] * missing)
+        self.anomaly.resize(capacity)
+        self.rates.resize(capacity + 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state worth keeping across restarts."""
+        return {
+            "anomaly": self.anomaly.as_dict(self.slots.index),
+            "last_seen": {
+                device_id: self._last_seen[slot]
+                for device_id, slot in self.slots.index.items()
+                if self._last_seen[slot]
+            },
+        }
+
+    def restore(self, stored: dict[str, Any]) -> None:
+        """Load state saved by as_dict."""
+        self.anomaly.restore(stored.get("anomaly", {}))
+        self._restored_last_seen = {
+            device_id: float(seen)
+            for device_id, seen in stored.get("last_seen", {}).items()
+            if isinstance(seen, (int, float))
+        }
@@ -1,11 +1,13 @@
 """Device tracker platform for AdGuard DNS."""
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from typing import Any
 
-from homeassistant.components.device_tracker import SourceType, TrackerEntity
+from homeassistant.components.device_tracker import ScannerEntity, SourceType
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
@@ -26,20 +28,51 @@ async def async_setup_entry(
     if not coordinator.data:
         return
 
-    entities = []
-    devices_data = coordinator.data.get("devices", {})
-    devices_list = devices_data.get("devices", [])
-    
-    for device in devices_list:
-        device_id = device.get("id")
-        if device_id:
-            entities.append(AdGuardDNSDeviceTracker(coordinator, device_id))
+    registry = er.async_get(hass)
+    prefix = f"{DOMAIN}_device_"
+    trackers: dict[str, AdGuardDNSDeviceTracker] = {}
+
+    # Drop trackers of devices the options no longer select
+    tracked = coordinator.data.get("tracked_devices")
+    for registry_entry in er.async_entries_for_config_entry(registry, entry.entry_id):
+        if (
+            tracked is not None
+            and registry_entry.domain == "device_tracker"
+            and registry_entry.unique_id.startswith(prefix)
+            and registry_entry.unique_id.removeprefix(prefix) not in tracked
+        ):
+            registry.async_remove(registry_entry.entity_id)
+
+    @callback
+    def _async_sync_trackers() -> None:
+        """Add and remove trackers as devices move in and out of the filter."""
+        if not coordinator.data or "tracked_devices" not in coordinator.data:
+            return
+        tracked = coordinator.data["tracked_devices"]
+        for device_id in trackers.keys() - tracked:
+            tracker = trackers.pop(device_id)
+            if tracker.registry_entry is not None:
+                registry.async_remove(tracker.entity_id)
+            else:
+                hass.async_create_task(tracker.async_remove())
+        new_devices = tracked - trackers.keys()
+        if not new_devices:
+            return
+        new_trackers = [AdGuardDNSDeviceTracker(coordinator, device_id) for device_id in new_devices]
+        trackers.update(zip(new_devices, new_trackers))
+        async_add_entities(new_trackers)
+
+    _async_sync_trackers()
+    entry.async_on_unload(coordinator.async_add_listener(_async_sync_trackers))
+
 
-    async_add_entities(entities)
+class AdGuardDNSDeviceTracker(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], ScannerEntity):
+    """Representation of an AdGuard DNS device tracker.
 
+    A scanner entity, so the state is home or not_home from is_connected.
+    """
 
-class AdGuardDNSDeviceTracker(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], TrackerEntity):
-    """Representation of an AdGuard DNS device tracker."""
+    _attr_source_type = SourceType.ROUTER
 
     def __init__(
         self,
@@ -58,17 +91,7 @@ class AdGuardDNSDeviceTracker(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator]
 
     def _get_device_info(self) -> dict[str, Any]:
         """Get device information from coordinator data."""
-        if not self.coordinator.data:
-            return {}
-        
-        devices_data = self.coordinator.data.get("devices", {})
-        devices_list = devices_data.get("devices", [])
-        
-        for device in devices_list:
-            if device.get("id") == self._device_id:
-                return device
-        
-        return {}
+        return self.coordinator.get_record("devices", self._device_id)
 
     @property
     def device_info(self) -> dict[str, Any]:
@@ -85,17 +108,20 @@ class AdGuardDNSDeviceTracker(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator]
         }
 
     @property
-    def source_type(self) -> SourceType:
-        """Return the source type of the device."""
-        return SourceType.ROUTER
+    def unique_id(self) -> str | None:
+        """Return the unique ID, scanner entities default to the MAC address."""
+        return self._attr_unique_id
+
+    def _get_presence(self) -> tuple[bool, float | None]:
+        """Return the precomputed presence and last query time of the device."""
+        if not self.coordinator.data:
+            return False, None
+        return self.coordinator.data.get("device_presence", {}).get(self._device_id, (False, None))
 
     @property
     def is_connected(self) -> bool:
-        """Return true if the device is connected."""
-        device_info = self._get_device_info()
-        # Consider device connected if it has recent activity
-        # This is a simplified check - you might want to implement more sophisticated logic
-        return device_info.get("status", "active") == "active"
+        """Return true if the device made queries within the consider home window."""
+        return self._get_presence()[0]
 
     @property
     def extra_state_attributes(self) -> dict[str, Any] | None:
@@ -108,6 +134,11 @@ class AdGuardDNSDeviceTracker(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator]
             "device_id": self._device_id,
             "device_name": device_info.get("name", "Unknown"),
         }
+
+        last_seen = self._get_presence()[1]
+        attributes["last_seen"] = (
+            datetime.fromtimestamp(last_seen, timezone.utc).isoformat() if last_seen else None
+        )
         
         # Add optional attributes if available
         if "linked_ip" in device_info:
@@ -0,0 +1,104 @@
+"""Snapshot diffing for AdGuard DNS devices and DNS servers."""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from .aggregation import COUNTER_KEYS, get_counter
+
+
+def record_summary(record: dict[str, Any]) -> dict[str, Any]:
+    """Return the parts of a record that changes are reported on.
+
+    That is every top-level field except the statistics object, with the
+    query counters resolved wherever the record keeps them.
+    """
+    summary = {key: value for key, value in record.items() if key != "statistics"}
+    for key in COUNTER_KEYS:
+        summary[key] = get_counter(record, key)
+    return summary
+
+
+@dataclass(slots=True)
+class RecordChange:
+    """What changed in a single device or DNS server."""
+
+    record_id: str
+    change: str  # "added", "removed" or "changed"
+    counters: dict[str, int] = field(default_factory=dict)
+    settings: dict[str, dict[str, Any]] = field(default_factory=dict)
+    fields: list[str] = field(default_factory=list)
+
+    def as_event_data(self) -> dict[str, Any]:
+        """Return the change as compact event data."""
+        data: dict[str, Any] = {"change": self.change}
+        if self.counters:
+            data["counters"] = self.counters
+        if self.settings:
+            data["settings"] = self.settings
+        if self.fields:
+            data["fields"] = self.fields
+        return data
+
+
+class SnapshotDiffer:
+    """Compare successive snapshots of a list of records keyed by ID.
+
+    Only a summary per record is kept from the previous snapshot, so the
+    statistics object is neither retained nor compared. Changes to it alone
+    are not reported.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the differ."""
+        self._summaries: dict[str, dict[str, Any]] | None = None
+
+    def diff(self, records: Iterable[dict[str, Any]]) -> list[RecordChange] | None:
+        """Diff a new snapshot against the previous one.
+
+        Returns None for the first snapshot, which only sets the baseline.
+        """
+        summaries: dict[str, dict[str, Any]] = {}
+        for record in records:
+            record_id = record.get("id")
+            if record_id:
+                summaries[record_id] = record_summary(record)
+
+        previous, self._summaries = self._summaries, summaries
+        if previous is None:
+            return None
+
+        changes = [
+            RecordChange(record_id, "removed")
+            for record_id in previous.keys() - summaries.keys()
+        ]
+        for record_id, summary in summaries.items():
+            old_summary = previous.get(record_id)
+            if old_summary is None:
+                changes.append(RecordChange(record_id, "added"))
+            elif old_summary != summary:
+                changes.append(_describe(record_id, old_summary, summary))
+        return changes
+
+
+def _describe(record_id: str, old: dict[str, Any], new: dict[str, Any]) -> RecordChange:
+    """Describe the differences between two record summaries."""
+    change = RecordChange(record_id, "changed")
+    for key in COUNTER_KEYS:
+        delta = new[key] - old[key]
+        if delta:
+            change.counters[key] = delta
+
+    old_settings = old.get("settings") or {}
+    new_settings = new.get("settings") or {}
+    for key in old_settings.keys() | new_settings.keys():
+        if old_settings.get(key) != new_settings.get(key):
+            change.settings[key] = {"old": old_settings.get(key), "new": new_settings.get(key)}
+
+    change.fields = sorted(
+        key
+        for key in old.keys() | new.keys()
+        if key not in ("settings", *COUNTER_KEYS) and old.get(key) != new.get(key)
+    )
+    return change
@@ -0,0 +1,186 @@
+"""Streaming query log export for AdGuard DNS."""
+from __future__ import annotations
+
+import csv
+from datetime import datetime
+import gzip
+import io
+import json
+import logging
+import os
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import DOMAIN, EVENT_EXPORT_PROGRESS, EXPORT_CSV_FIELDS, EXPORT_DIR
+
+if TYPE_CHECKING:
+    from .coordinator import AdGuardDNSDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+_ACTIVE_EXPORTS = f"{DOMAIN}_active_exports"
+
+
+class QueryLogExportWriter:
+    """Write query log pages to a gzip'd NDJSON or CSV file.
+
+    Every method does blocking file I/O and must run in the executor. Each
+    page is written as a complete gzip member and synced, then a checkpoint
+    holding the next cursor and the file size is written next to it. An
+    interrupted export resumes by cutting the file back to that size, which
+    drops any half-written member, so the file stays a valid gzip stream.
+    """
+
+    def __init__(self, path: Path, export_format: str, params: dict[str, Any]) -> None:
+        """Initialize the writer."""
+        self.path = path
+        self.checkpoint_path = path.with_name(f"{path.name}.checkpoint")
+        self._format = export_format
+        self._params = params
+        self._file: IO[bytes] | None = None
+
+    def open(self) -> dict[str, Any] | None:
+        """Open the export file, returning the checkpoint when resuming."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        checkpoint = self._load_checkpoint()
+        if checkpoint:
+            self._file = open(self.path, "r+b")  # noqa: SIM115
+            self._file.truncate(checkpoint["offset"])
+            self._file.seek(checkpoint["offset"])
+        else:
+            self._file = open(self.path, "wb")  # noqa: SIM115
+            if self._format == "csv":
+                buffer = io.StringIO(newline="")
+                csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS).writeheader()
+                self._write_member(buffer.getvalue())
+        return checkpoint
+
+    def write_page(self, items: list[dict[str, Any]], state: dict[str, Any]) -> None:
+        """Append a page of items and record the checkpoint after it."""
+        assert self._file is not None
+        if self._format == "csv":
+            buffer = io.StringIO(newline="")
+            csv.DictWriter(
+                buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore"
+            ).writerows(_flatten(item) for item in items)
+            text = buffer.getvalue()
+        else:
+            text = "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in items)
+        self._write_member(text)
+
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.tmp")
+        tmp_path.write_text(
+            json.dumps({**self._params, **state, "offset": self._file.tell()}), encoding="utf-8"
+        )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _write_member(self, text: str) -> None:
+        """Append text as a complete gzip member and sync it to disk."""
+        assert self._file is not None
+        self._file.write(gzip.compress(text.encode("utf-8")))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, complete: bool) -> None:
+        """Close the file, dropping the checkpoint once the export is complete."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if complete:
+            self.checkpoint_path.unlink(missing_ok=True)
+
+    def _load_checkpoint(self) -> dict[str, Any] | None:
+        """Return a checkpoint left by an interrupted export of the same range."""
+        if not self.path.exists() or not self.checkpoint_path.exists():
+            return None
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if any(checkpoint.get(key) != value for key, value in self._params.items()):
+            return None
+        # Checkpoints from before the file size was recorded cannot be resumed safely
+        offset = checkpoint.get("offset")
+        if not isinstance(offset, int) or offset > self.path.stat().st_size:
+            return None
+        return checkpoint
+
+
+def _flatten(item: dict[str, Any]) -> dict[str, Any]:
+    """Flatten the nested fields of a query log item for CSV output."""
+    filtering_info = item.get("filtering_info") or {}
+    return {**item, "filtering_status": filtering_info.get("filtering_status")}
+
+
+def get_export_path(hass: HomeAssistant, filename: str) -> Path:
+    """Return the path of an export file inside the config directory."""
+    if not filename or Path(filename).name != filename:
+        raise HomeAssistantError(f"Invalid export file name: {filename}")
+    return Path(hass.config.path(DOMAIN, EXPORT_DIR, filename))
+
+
+async def async_export_query_log(
+    hass: HomeAssistant,
+    coordinator: AdGuardDNSDataUpdateCoordinator,
+    start: datetime,
+    end: datetime,
+    export_format: str,
+    filename: str,
+) -> dict[str, Any]:
+    """Stream the query log between start and end into a compressed file.
+
+    Only one page is held in memory at a time. Progress is reported through
+    adguard_dns_export_progress events after every page.
+    """
+    path = get_export_path(hass, filename)
+    active: set[Path] = hass.data.setdefault(_ACTIVE_EXPORTS, set())
+    if path in active:
+        raise HomeAssistantError(f"Export to {filename} is already running")
+    active.add(path)
+
+    params = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "format": export_format,
+    }
+    writer = QueryLogExportWriter(path, export_format, params)
+    complete = False
+    try:
+        checkpoint = await hass.async_add_executor_job(writer.open)
+        cursor = checkpoint["cursor"] if checkpoint else None
+        records = checkpoint["records"] if checkpoint else 0
+        pages = checkpoint["pages"] if checkpoint else 0
+        if checkpoint:
+            _LOGGER.info("Resuming query log export to %s after %s records", path, records)
+
+        done = bool(checkpoint and checkpoint.get("done"))
+        while not done:
+            items, cursor = await coordinator.async_fetch_query_log_page(start, end, cursor)
+            records += len(items)
+            pages += 1
+            done = not cursor or not items
+            await hass.async_add_executor_job(
+                writer.write_page,
+                items,
+                {"cursor": cursor, "records": records, "pages": pages, "done": done},
+            )
+            hass.bus.async_fire(
+                EVENT_EXPORT_PROGRESS,
+                {"path": str(path), "records": records, "pages": pages, "done": done},
+            )
+
+        complete = True
+    finally:
+        await hass.async_add_executor_job(writer.close, complete)
+        active.discard(path)
+
+    _LOGGER.info("Exported %s query log records to %s", records, path)
+    return {
+        "path": str(path),
+        "records": records,
+        "pages": pages,
+        "resumed": checkpoint is not None,
+    }
@@ -0,0 +1,336 @@
+"""On-disk query history in memory-mapped ring files.
+
+Each tier, such as one-minute buckets, is one file with a fixed number of
+rows, so the store never grows past its configured size. Files are laid
+out column by column: a header, the bucket start time of every row, then
+for each series (the account, then one per device) a run of rows holding
+(queries, blocked) as two unsigned 32-bit counts. A new device only
+appends a column at the end of the file, and a range read of one series
+is a slice of at most two contiguous runs of the mapping.
+
+Nothing here touches the event loop. Writes and reads are meant for the
+executor and are serialized by a lock.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+import struct
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"AGDH"
+FORMAT_VERSION = 1
+# magic, version, bucket seconds, rows, columns, head row
+_HEADER = struct.Struct("<4sHIIII")
+HEADER_SIZE = 64
+_UINT32_MAX = 0xFFFFFFFF
+
+ACCOUNT_SERIES = ""
+SERIES_FILE = "series.json"
+# Columns are added in blocks so the file is not remapped for every new device
+COLUMN_BLOCK = 64
+# Seconds between saves of the series map made only to record last seen times
+LAST_SEEN_SAVE_INTERVAL = 300
+
+
+@dataclass(slots=True)
+class HistoryBatch:
+    """The activity seen by one refresh."""
+
+    time: float
+    # (device ID, queries, blocked), only for devices with activity
+    deltas: list[tuple[str, int, int]]
+
+
+class HistoryTier:
+    """One ring file of fixed-size time buckets."""
+
+    def __init__(self, path: Path, bucket: int, rows: int) -> None:
+        """Open or create the file."""
+        self.path = path
+        self.bucket = bucket
+        self.rows = rows
+        self.columns = 0
+        self.head = 0
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._times: memoryview | None = None
+        self._values: memoryview | None = None
+        self._open()
+
+    def _open(self) -> None:
+        """Map the file, starting it over if it does not match the tier."""
+        exists = self.path.exists()
+        self._file = open(self.path, "r+b" if exists else "w+b")  # noqa: SIM115
+        header = self._file.read(_HEADER.size) if exists else b""
+        if len(header) == _HEADER.size:
+            magic, version, bucket, rows, columns, head = _HEADER.unpack(header)
+            if (magic, version, bucket, rows) == (MAGIC, FORMAT_VERSION, self.bucket, self.rows):
+                self.columns = columns
+                self.head = head
+            else:
+                _LOGGER.warning("Starting %s over, its layout does not match", self.path.name)
+                self._file.truncate(0)
+        self._remap(max(self.columns, COLUMN_BLOCK))
+
+    def _remap(self, columns: int) -> None:
+        """Resize the file to hold the given number of columns and map it again."""
+        self._release()
+        size = HEADER_SIZE + self.rows * 8 + columns * self.rows * 8
+        if os.fstat(self._file.fileno()).st_size != size:
+            self._file.truncate(size)
+        self.columns = columns
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._write_header()
+        view = memoryview(self._map)
+        self._times = view[HEADER_SIZE:HEADER_SIZE + self.rows * 8].cast("q")
+        self._values = view[HEADER_SIZE + self.rows * 8:].cast("I")
+
+    def _release(self) -> None:
+        """Drop the views and the mapping."""
+        if self._times is not None:
+            self._times.release()
+            self._values.release()
+            self._times = self._values = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _write_header(self) -> None:
+        """Store the layout and head row in the file."""
+        _HEADER.pack_into(
+            self._map, 0, MAGIC, FORMAT_VERSION, self.bucket, self.rows, self.columns, self.head
+        )
+
+    def ensure_columns(self, columns: int) -> None:
+        """Grow the file to hold at least the given number of columns."""
+        if columns > self.columns:
+            self._remap(-(-columns // COLUMN_BLOCK) * COLUMN_BLOCK)
+
+    def clear_column(self, column: int) -> None:
+        """Zero a column before it is reused by another device."""
+        start = column * self.rows * 2
+        self._values[start:start + self.rows * 2] = memoryview(bytes(self.rows * 8)).cast("I")
+
+    def _row(self, timestamp: float) -> int | None:
+        """Return the row of a time's bucket, advancing the ring if needed."""
+        bucket = int(timestamp) // self.bucket * self.bucket
+        current = self._times[self.head]
+        if bucket == current:
+            return self.head
+        if bucket < current:
+            # Older than the newest bucket, find it if still kept
+            steps = (current - bucket) // self.bucket
+            if steps >= self.rows:
+                return None
+            row = (self.head - steps) % self.rows
+            return row if self._times[row] == bucket else None
+
+        steps = min((bucket - current) // self.bucket if current else 1, self.rows)
+        first = (self.head + 1) % self.rows
+        self.head = (self.head + steps) % self.rows
+        # The rows moved over hold buckets that fell out of the ring
+        runs = (
+            [(first, first + steps)]
+            if first + steps <= self.rows
+            else [(first, self.rows), (0, first + steps - self.rows)]
+        )
+        for start, stop in runs:
+            self._times[start:stop] = memoryview(bytes((stop - start) * 8)).cast("q")
+            zeros = memoryview(bytes((stop - start) * 8)).cast("I")
+            for column in range(self.columns):
+                base = column * self.rows * 2
+                self._values[base + start * 2:base + stop * 2] = zeros
+        self._times[self.head] = bucket
+        self._write_header()
+        return self.head
+
+    def add(self, timestamp: float, deltas: Iterable[tuple[int, int, int]]) -> None:
+        """Add (column, queries, blocked) activity to the bucket of a time."""
+        row = self._row(timestamp)
+        if row is None:
+            return
+        values = self._values
+        for column, queries, blocked in deltas:
+            index = (column * self.rows + row) * 2
+            values[index] = min(values[index] + queries, _UINT32_MAX)
+            values[index + 1] = min(values[index + 1] + blocked, _UINT32_MAX)
+
+    def read(self, column: int, start: float, end: float) -> list[list[int]]:
+        """Return [bucket start, queries, blocked] rows between two times, oldest first."""
+        if column >= self.columns:
+            return []
+        times = self._times
+        base = column * self.rows * 2
+        # Rows oldest first, as at most two contiguous runs of the ring
+        runs = [range(self.head + 1, self.rows), range(0, self.head + 1)]
+        points = []
+        for run in runs:
+            if not run:
+                continue
+            values = self._values[base + run.start * 2:base + run.stop * 2]
+            for offset, row in enumerate(run):
+                bucket = times[row]
+                if bucket and start <= bucket <= end:
+                    points.append([bucket, values[offset * 2], values[offset * 2 + 1]])
+            values.release()
+        return points
+
+    def flush(self) -> None:
+        """Write dirty pages to disk."""
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self) -> None:
+        """Flush and unmap the file."""
+        self.flush()
+        self._release()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class HistoryStore:
+    """Per-device query history in tiers of downsampled buckets.
+
+    Every batch is added to the bucket it falls in on every tier, so a
+    coarser tier holds the sum of the finer buckets it covers.
+    """
+
+    def __init__(self, directory: Path, tiers: Mapping[str, tuple[int, int]]) -> None:
+        """Initialize the store, files are opened by open."""
+        self.directory = directory
+        self._tier_specs = tiers
+        self.tiers: dict[str, HistoryTier] = {}
+        # Device ID to [column, last time seen]
+        self._series: dict[str, list[float]] = {}
+        self._free: list[int] = []
+        self._columns = 0
+        self._lock = threading.Lock()
+        self._dirty_series = False
+        # Last seen times changed since the series map was saved, see write
+        self._stale_last_seen = False
+        self._series_saved_at = time.monotonic()
+
+    @property
+    def retention(self) -> int:
+        """Return the span of the longest tier in seconds."""
+        return max(bucket * rows for bucket, rows in self._tier_specs.values())
+
+    def open(self) -> None:
+        """Open or create the tier files."""
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.tiers = {
+                name: HistoryTier(self.directory / f"{name}.bin", bucket, rows)
+                for name, (bucket, rows) in self._tier_specs.items()
+            }
+            series_path = self.directory / SERIES_FILE
+            try:
+                self._series = json.loads(series_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._series = {}
+            self._series.setdefault(ACCOUNT_SERIES, [0, time.time()])
+            used = {int(column) for column, _ in self._series.values()}
+            self._columns = max(used) + 1
+            self._free = sorted(set(range(self._columns)) - used, reverse=True)
+
+    def _column(self, device_id: str, now: float) -> int:
+        """Return the column of a series, assigning one to a new device.
+
+        Tiers are grown by the caller once all new columns are known.
+        """
+        entry = self._series.get(device_id)
+        if entry is None:
+            if self._free:
+                column = self._free.pop()
+                for tier in self.tiers.values():
+                    tier.clear_column(column)
+            else:
+                column = self._columns
+                self._columns += 1
+            entry = self._series[device_id] = [column, now]
+            self._dirty_series = True
+        elif entry[1] != now:
+            entry[1] = now
+            self._stale_last_seen = True
+        return int(entry[0])
+
+    def write(self, batches: Iterable[HistoryBatch]) -> None:
+        """Add the activity of refreshes to every tier."""
+        with self._lock:
+            if not self.tiers:
+                return
+            latest = 0.0
+            for batch in batches:
+                rows = [(self._column(ACCOUNT_SERIES, batch.time), 0, 0)]
+                account_queries = account_blocked = 0
+                for device_id, queries, blocked in batch.deltas:
+                    rows.append((self._column(device_id, batch.time), queries, blocked))
+                    account_queries += queries
+                    account_blocked += blocked
+                rows[0] = (rows[0][0], account_queries, account_blocked)
+                for tier in self.tiers.values():
+                    tier.ensure_columns(self._columns)
+                    tier.add(batch.time, rows)
+                latest = max(latest, batch.time)
+            if latest:
+                self._expire(latest)
+            # Last seen times only decide when a column expires, a few minutes
+            # lost on a crash do not matter, so they are saved at a lower rate
+            if self._dirty_series or (
+                self._stale_last_seen
+                and time.monotonic() - self._series_saved_at >= LAST_SEEN_SAVE_INTERVAL
+            ):
+                self._save_series()
+
+    def _expire(self, now: float) -> None:
+        """Free the columns of devices without activity for the whole retention."""
+        cutoff = now - self.retention
+        for device_id, (column, last_seen) in list(self._series.items()):
+            if device_id != ACCOUNT_SERIES and last_seen < cutoff:
+                del self._series[device_id]
+                self._free.append(int(column))
+                self._dirty_series = True
+
+    def _save_series(self) -> None:
+        """Write the device to column map next to the tier files."""
+        path = self.directory / SERIES_FILE
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self._series), encoding="utf-8")
+        os.replace(temp_path, path)
+        self._dirty_series = self._stale_last_seen = False
+        self._series_saved_at = time.monotonic()
+
+    def read(
+        self, tier: str, device_id: str | None, start: float, end: float
+    ) -> list[list[int]] | None:
+        """Return the buckets of a series between two times, None if unknown."""
+        with self._lock:
+            entry = self._series.get(device_id or ACCOUNT_SERIES)
+            if entry is None or tier not in self.tiers:
+                return None
+            return self.tiers[tier].read(int(entry[0]), start, end)
+
+    def flush(self) -> None:
+        """Write dirty pages of every tier to disk."""
+        with self._lock:
+            for tier in self.tiers.values():
+                tier.flush()
+
+    def close(self) -> None:
+        """Close every tier file."""
+        with self._lock:
+            for tier in self.tiers.values():
+                tier.close()
+            self.tiers = {}
+            if self._dirty_series or self._stale_last_seen:
+                self._save_series()
@@ -0,0 +1,305 @@
+"""Data model build for AdGuard DNS refreshes.
+
+Everything here is plain CPU work on already fetched payloads, with no
+Home Assistant or event loop dependencies, so a whole build can run in
+the executor for large accounts.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+import json
+import logging
+from typing import Any
+
+from .aggregation import TOP_DOMAINS_COUNT, domain_counts, get_counter
+from .const import CONTROL_SETTINGS
+from .diff import RecordChange, SnapshotDiffer
+from .profiling import ProfileRun, timed
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bodies from this size are decoded one element at a time, see decode_body
+CHUNKED_DECODE_MIN = 1024 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    """The result of one data model build.
+
+    data is a new dict that is never mutated once built. Later writes,
+    such as optimistic settings updates, copy the parts they change.
+    """
+
+    data: dict[str, Any]
+    succeeded: frozenset[str]
+    changes: dict[str, list[RecordChange]]
+
+
+def decode_body(body: bytes) -> Any:
+    """Decode a JSON body.
+
+    json.loads holds the GIL for the whole document, which stalls the event
+    loop even when called from the executor. Large bodies are therefore
+    decoded one top-level value or list element at a time, giving other
+    threads a chance to run in between.
+    """
+    if len(body) < CHUNKED_DECODE_MIN:
+        return json.loads(body)
+
+    text = body.decode("utf-8")
+    position = _skip(text, 0)
+    if text.startswith("[", position):
+        value, position = _decode_list(text, position)
+    elif text.startswith("{", position):
+        value, position = _decode_object(text, position)
+    else:
+        value, position = _DECODER.raw_decode(text, position)
+    if _skip(text, position) != len(text):
+        raise ValueError(f"Extra data at position {position}")
+    return value
+
+
+def _skip(text: str, position: int) -> int:
+    """Return the position of the next non-whitespace character."""
+    while position < len(text) and text[position] in _WHITESPACE:
+        position += 1
+    return position
+
+
+def _expect(text: str, position: int, char: str) -> int:
+    """Skip whitespace and a separator, returning the position after it."""
+    position = _skip(text, position)
+    if not text.startswith(char, position):
+        raise ValueError(f"Expected {char!r} at position {position}")
+    return _skip(text, position + 1)
+
+
+def _decode_list(text: str, position: int) -> tuple[list[Any], int]:
+    """Decode a JSON array element by element."""
+    items: list[Any] = []
+    position = _expect(text, position, "[")
+    if text.startswith("]", position):
+        return items, position + 1
+    while True:
+        item, position = _DECODER.raw_decode(text, position)
+        items.append(item)
+        position = _skip(text, position)
+        if text.startswith("]", position):
+            return items, position + 1
+        position = _expect(text, position, ",")
+
+
+def _decode_object(text: str, position: int) -> tuple[dict[str, Any], int]:
+    """Decode a JSON object, splitting list values into their elements."""
+    obj: dict[str, Any] = {}
+    position = _expect(text, position, "{")
+    if text.startswith("}", position):
+        return obj, position + 1
+    while True:
+        key, position = _DECODER.raw_decode(text, position)
+        position = _expect(text, position, ":")
+        if text.startswith("[", position):
+            obj[key], position = _decode_list(text, position)
+        else:
+            obj[key], position = _DECODER.raw_decode(text, position)
+        position = _skip(text, position)
+        if text.startswith("}", position):
+            return obj, position + 1
+        position = _expect(text, position, ",")
+
+
+def decode_results(raw_results: Mapping[str, bytes | BaseException]) -> dict[str, Any]:
+    """Decode raw endpoint bodies, leaving failed fetches as exceptions."""
+    results: dict[str, Any] = {}
+    for group, body in raw_results.items():
+        if isinstance(body, BaseException):
+            results[group] = body
+            continue
+        try:
+            results[group] = decode_body(body) if body.strip() else {}
+        except ValueError as err:
+            results[group] = err
+    return results
+
+
+def process_results(
+    data: dict[str, Any],
+    results: Mapping[str, Any],
+    rollup: Callable[[str], str] | None = None,
+    keep_previous: bool = False,
+) -> None:
+    """Merge fetched endpoint groups into a data dict.
+
+    Failed groups fall back to empty defaults, or keep their previous
+    value in data when keep_previous is set.
+    """
+    for group, result in results.items():
+        if not isinstance(result, dict):
+            _LOGGER.warning("Failed to fetch %s: %s", group.replace("_", " "), result)
+            if keep_previous:
+                continue
+
+        if group == "account_limits":
+            data["account_limits"] = result if isinstance(result, dict) else {}
+
+        elif group == "devices":
+            if isinstance(result, dict):
+                data["devices"] = result
+                # Calculate basic stats from devices
+                devices_list = result.get("devices", [])
+                data["total_queries"] = sum(device.get("queries_count", 0) for device in devices_list)
+                data["blocked_queries"] = sum(device.get("blocked_count", 0) for device in devices_list)
+                if data["total_queries"] > 0:
+                    data["blocked_percentage"] = round((data["blocked_queries"] / data["total_queries"]) * 100, 2)
+                else:
+                    data["blocked_percentage"] = 0
+                # Aggregate domains once per refresh instead of in every sensor update
+                # Full lists back the websocket API, sensors show the top of them
+                data["blocked_domains"] = domain_counts(
+                    devices_list, "top_blocked_domains", rollup
+                )
+                data["queried_domains"] = domain_counts(
+                    devices_list, "top_queried_domains", rollup
+                )
+                data["top_blocked_domains"] = data["blocked_domains"][:TOP_DOMAINS_COUNT]
+                data["top_queried_domains"] = data["queried_domains"][:TOP_DOMAINS_COUNT]
+                data["device_counters"] = device_counters(devices_list)
+            else:
+                data["devices"] = {}
+                data["total_queries"] = 0
+                data["blocked_queries"] = 0
+                data["blocked_percentage"] = 0
+                data["blocked_domains"] = []
+                data["queried_domains"] = []
+                data["top_blocked_domains"] = []
+                data["top_queried_domains"] = []
+                data["device_counters"] = {}
+
+        elif group == "dns_servers":
+            if isinstance(result, dict):
+                data["dns_servers"] = result
+                # Determine protection status from DNS servers
+                dns_servers = result.get("dns_servers", [])
+                data["protection_enabled"] = any(server.get("settings", {}).get("protection_enabled", False) for server in dns_servers)
+            else:
+                data["dns_servers"] = {}
+                data["protection_enabled"] = True  # Default to enabled
+
+        elif group == "dedicated_addresses":
+            data["dedicated_addresses"] = result if isinstance(result, dict) else {}
+
+
+def device_counters(devices: list[dict[str, Any]]) -> dict[str, tuple[int, int, float]]:
+    """Return queries, blocked queries and block percentage by device ID.
+
+    Per-device sensors read their value from this slice with a single
+    lookup instead of scanning the device list.
+    """
+    counters: dict[str, tuple[int, int, float]] = {}
+    for device in devices:
+        if not (device_id := device.get("id")):
+            continue
+        queries = get_counter(device, "queries_count")
+        blocked = get_counter(device, "blocked_count")
+        percentage = round(blocked / queries * 100, 2) if queries > 0 else 0
+        counters[device_id] = (queries, blocked, percentage)
+    return counters
+
+
+def get_setting(settings: dict[str, Any], path: tuple[str, ...]) -> Any:
+    """Return the value at a key path inside a settings dict."""
+    value: Any = settings
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def server_aggregates(data: Mapping[str, Any]) -> dict[str, dict[str, Any]]:
+    """Join devices to their DNS server and total them up per server.
+
+    Per-server entities read their value from the result instead of
+    scanning the device list.
+    """
+    servers = data.get("dns_servers", {}).get("dns_servers", [])
+    devices = data.get("devices", {}).get("devices", [])
+    counters = data.get("device_counters", {})
+    addresses = data.get("dedicated_addresses", {}).get("dedicated_addresses", [])
+
+    ipv4_by_device: dict[str, list[str]] = {}
+    for address in addresses:
+        if (device_id := address.get("device_id")) and address.get("ip"):
+            ipv4_by_device.setdefault(device_id, []).append(address["ip"])
+
+    aggregates: dict[str, dict[str, Any]] = {}
+    for server in servers:
+        if not (server_id := server.get("id")):
+            continue
+        settings = server.get("settings", {})
+        aggregates[server_id] = {
+            "device_ids": [],
+            "device_count": 0,
+            "queries": 0,
+            "blocked": 0,
+            "blocked_percentage": 0,
+            "protection_enabled": bool(get_setting(settings, CONTROL_SETTINGS["protection"])),
+            "filtering_enabled": bool(get_setting(settings, CONTROL_SETTINGS["filtering"])),
+            "dedicated_ipv4": [],
+        }
+
+    for device in devices:
+        aggregate = aggregates.get(device.get("dns_server_id"))
+        if aggregate is None or not (device_id := device.get("id")):
+            continue
+        aggregate["device_ids"].append(device_id)
+        aggregate["device_count"] += 1
+        queries, blocked, _ = counters.get(device_id, (0, 0, 0))
+        aggregate["queries"] += queries
+        aggregate["blocked"] += blocked
+        aggregate["dedicated_ipv4"].extend(ipv4_by_device.get(device_id, ()))
+
+    for aggregate in aggregates.values():
+        if aggregate["queries"] > 0:
+            aggregate["blocked_percentage"] = round(aggregate["blocked"] / aggregate["queries"] * 100, 2)
+    return aggregates
+
+
+def build_snapshot(
+    previous: Mapping[str, Any] | None,
+    raw_results: Mapping[str, bytes | BaseException],
+    differs: Mapping[str, SnapshotDiffer],
+    rollup: Callable[[str], str] | None = None,
+    run: ProfileRun | None = None,
+) -> Snapshot:
+    """Decode, build and diff the data model for one refresh.
+
+    With a previous data dict, only the fetched groups are replaced and
+    failed ones keep their previous value. Differs are updated in place,
+    so builds sharing them must not run concurrently.
+    """
+    with timed(run, "decode"):
+        results = decode_results(raw_results)
+    keep_previous = previous is not None
+    data = dict(previous) if previous is not None else {}
+    with timed(run, "aggregation"):
+        process_results(data, results, rollup, keep_previous)
+        if results.keys() & {"devices", "dns_servers", "dedicated_addresses"}:
+            data["server_aggregates"] = server_aggregates(data)
+
+    succeeded = frozenset(
+        group for group, result in results.items() if isinstance(result, dict)
+    )
+    changes: dict[str, list[RecordChange]] = {}
+    with timed(run, "diff"):
+        for resource, differ in differs.items():
+            if resource not in succeeded:
+                continue
+            resource_changes = differ.diff(data[resource].get(resource, []))
+            if resource_changes is not None:
+                changes[resource] = resource_changes
+    return Snapshot(data, succeeded, changes)
@@ -0,0 +1,173 @@
+"""Phase timings and cProfile captures of coordinator refreshes."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+import cProfile
+from datetime import datetime
+import io
+import logging
+from pathlib import Path
+import pstats
+import time
+from typing import Any, TypeVar
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+# Functions listed in a report, by cumulative time
+REPORT_FUNCTIONS = 40
+
+_NO_PHASE = nullcontext()
+
+
+class ProfileRun:
+    """Timings, and optionally a cProfile capture, of a single refresh.
+
+    The profiler only sees the thread it was enabled on. Work sent to the
+    executor through wrap is captured by its own profiler and merged into
+    the report, where the Python version allows a second one to run.
+    """
+
+    def __init__(self, capture: bool, reason: str | None = None) -> None:
+        """Start the run, reason being why it is reported even when fast."""
+        self.reason = reason
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.phases: dict[str, float] = {}
+        self.captured = False
+        self._profiles: list[cProfile.Profile] = []
+        self._profile: cProfile.Profile | None = None
+        if capture:
+            self._profile = self._enable()
+
+    @staticmethod
+    def _enable() -> cProfile.Profile | None:
+        """Return an enabled profiler, or None if another one is active."""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            _LOGGER.debug("Another profiler is active, recording phase timings only")
+            return None
+        return profile
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Add time spent in a phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        """Time the code run inside the block as a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def wrap(self, func: Callable[..., _T]) -> Callable[..., _T]:
+        """Return func profiled on whatever thread runs it."""
+        if self._profile is None:
+            return func
+
+        def profiled(*args: Any) -> _T:
+            profile = self._enable()
+            try:
+                return func(*args)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                    self._profiles.append(profile)
+
+        return profiled
+
+    def finish(self) -> None:
+        """Stop the run."""
+        self.duration = time.perf_counter() - self.started
+        if self._profile is not None:
+            self._profile.disable()
+            self._profiles.insert(0, self._profile)
+            self._profile = None
+            self.captured = True
+
+    def summary(self) -> dict[str, Any]:
+        """Return the duration and phase timings in milliseconds."""
+        return {
+            "duration": round(self.duration * 1000, 1),
+            "phases": {
+                phase: round(seconds * 1000, 1)
+                for phase, seconds in sorted(self.phases.items(), key=lambda item: -item[1])
+            },
+        }
+
+    def write(self, directory: Path, reason: str) -> Path:
+        """Write the report, and the pstats dump if captured, returning the report path.
+
+        Sorting and dumping the stats is slow, so this runs in the executor.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"refresh-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        report = io.StringIO()
+        report.write(f"Refresh took {self.duration * 1000:.1f} ms ({reason})\n\n")
+        for phase, milliseconds in self.summary()["phases"].items():
+            report.write(f"{phase:<40} {milliseconds:>10.1f} ms\n")
+
+        if self.captured:
+            stats = pstats.Stats(self._profiles[0], stream=report)
+            for profile in self._profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(directory / f"{name}.prof")
+            report.write(f"\nFull profile: {name}.prof\n\n")
+            stats.sort_stats("cumulative").print_stats(REPORT_FUNCTIONS)
+            self._profiles.clear()
+
+        path = directory / f"{name}.txt"
+        path.write_text(report.getvalue(), encoding="utf-8")
+        return path
+
+
+def timed(run: ProfileRun | None, phase: str) -> AbstractContextManager[Any]:
+    """Time a phase of a run, doing nothing when the refresh is not profiled."""
+    return run.phase(phase) if run is not None else _NO_PHASE
+
+
+class RefreshProfiler:
+    """Decide which refreshes to profile.
+
+    Refreshes can be requested explicitly, and with a threshold every
+    refresh records phase timings so a slow one is reported and the next
+    one captured in full. With neither, no run is started at all.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        """Initialize the profiler."""
+        self.threshold = threshold
+        self._requested = 0
+        self._capture_next = False
+
+    def request(self, refreshes: int) -> None:
+        """Profile the next refreshes in full."""
+        self._requested = refreshes
+
+    def start(self) -> ProfileRun | None:
+        """Return a run for a starting refresh, or None if it is not profiled."""
+        if self._requested:
+            self._requested -= 1
+            return ProfileRun(capture=True, reason="requested")
+        if self._capture_next:
+            self._capture_next = False
+            return ProfileRun(capture=True, reason="after a slow refresh")
+        if self.threshold:
+            return ProfileRun(capture=False)
+        return None
+
+    def finish(self, run: ProfileRun) -> str | None:
+        """Finish a run, returning why it should be reported, if it should."""
+        run.finish()
+        if self.threshold and run.duration >= self.threshold:
+            if not run.captured:
+                # The cause may be gone by then, but slow refreshes tend to come in runs
+                self._capture_next = True
+            return "slow"
+        return run.reason
@@ -0,0 +1,81 @@
+"""Registrable domain (eTLD+1) lookup backed by the bundled Public Suffix List."""
+from __future__ import annotations
+
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import Any
+
+PUBLIC_SUFFIX_LIST = Path(__file__).parent / "public_suffix_list.dat"
+
+# Memoized lookups kept in front of the trie
+DOMAIN_CACHE_SIZE = 65536
+
+# Trie node keys that can never clash with a label, as labels never contain
+# a dot: the end of a rule, and "." + label for exception rules
+_END = "."
+_EXCEPTION_KEY = "."
+_WILDCARD = "*"
+# Prefix of exception rules in the list
+_EXCEPTION = "!"
+
+
+@cache
+def load_public_suffix_trie() -> dict[str, Any]:
+    """Load the bundled list into a trie keyed by labels from the right.
+
+    Reads a file, so call it from the executor. The trie is built once per
+    process and shared by every config entry.
+    """
+    trie: dict[str, Any] = {}
+    with PUBLIC_SUFFIX_LIST.open(encoding="utf-8") as rules:
+        for rule in rules:
+            rule = rule.strip()
+            if not rule or rule.startswith("//"):
+                continue
+            exception = rule.startswith(_EXCEPTION)
+            labels = rule.lstrip(_EXCEPTION).split(".")
+            node = trie
+            for label in reversed(labels[1:] if exception else labels):
+                node = node.setdefault(label, {})
+            if exception:
+                node[_EXCEPTION_KEY + labels[0]] = True
+            else:
+                node[_END] = True
+    return trie
+
+
+def _public_suffix_length(labels: list[str]) -> int:
+    """Return how many trailing labels form the public suffix."""
+    node = load_public_suffix_trie()
+    # Unlisted TLDs are public suffixes by the list's implicit "*" rule
+    length = 1
+    for depth, label in enumerate(reversed(labels), 1):
+        if _EXCEPTION_KEY + label in node:
+            return depth - 1
+        if _WILDCARD in node:
+            length = depth
+        node = node.get(label)
+        if not isinstance(node, dict):
+            break
+        if _END in node:
+            length = depth
+    return length
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def registrable_domain(domain: str) -> str:
+    """Return the registrable domain (eTLD+1) of a domain name.
+
+    Domains that are themselves public suffixes, empty names and names
+    with an empty label are returned unchanged. The trie must have been
+    loaded before the first call on the event loop, see
+    load_public_suffix_trie.
+    """
+    domain = domain.rstrip(".").lower()
+    labels = domain.split(".")
+    if "" in labels:
+        return domain
+    length = _public_suffix_length(labels)
+    if len(labels) <= length:
+        return domain
+    return ".".join(labels[-length - 1:])
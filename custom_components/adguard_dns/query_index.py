@@ -0,0 +1,321 @@
+"""In-memory index over a sliding window of AdGuard DNS query log entries."""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Iterable
+from typing import Any
+
+STATUS_ALLOWED = "allowed"
+STATUS_BLOCKED = "blocked"
+STATUSES = [STATUS_ALLOWED, STATUS_BLOCKED]
+
+# Translation tables turning the status column into "0"/"1" digits per status
+_BIT_TABLES = [
+    bytes(ord("1") if code == status_code else ord("0") for code in range(256))
+    for status_code in range(len(STATUSES))
+]
+
+# Compact the entry arrays once this many evicted entries have piled up
+_COMPACT_MIN = 4096
+
+
+def query_status(item: dict[str, Any]) -> str:
+    """Return the status of a query log item."""
+    if "status" in item:
+        return STATUS_BLOCKED if item["status"] == STATUS_BLOCKED else STATUS_ALLOWED
+    filtering_status = (item.get("filtering_info") or {}).get("filtering_status") or ""
+    return STATUS_BLOCKED if "BLOCKED" in filtering_status else STATUS_ALLOWED
+
+
+def _reverse_labels(domain: str) -> str:
+    """Return a domain with its labels in reverse order."""
+    return ".".join(reversed(domain.split(".")))
+
+
+class _Interner:
+    """Map strings to small integer IDs and keep a postings list per ID.
+
+    Postings hold the absolute sequence numbers of the entries using the
+    string, in ascending order. IDs whose postings run empty are recycled.
+    """
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.names: list[str] = []
+        self.postings: list[array] = []
+        self._free: list[int] = []
+
+    def add(self, name: str, seq: int) -> int:
+        """Record a use of name by the entry with sequence number seq."""
+        ident = self.ids.get(name)
+        if ident is None:
+            if self._free:
+                ident = self._free.pop()
+                self.names[ident] = name
+            else:
+                ident = len(self.names)
+                self.names.append(name)
+                self.postings.append(array("Q"))
+            self.ids[name] = ident
+        self.postings[ident].append(seq)
+        return ident
+
+    def trim(self, base: int) -> set[int]:
+        """Drop postings below base, returning the IDs that were freed."""
+        freed = set()
+        for ident, postings in enumerate(self.postings):
+            if not postings or postings[0] >= base:
+                continue
+            del postings[: bisect_left(postings, base)]
+            if not postings:
+                del self.ids[self.names[ident]]
+                self.names[ident] = ""
+                self._free.append(ident)
+                freed.add(ident)
+        return freed
+
+
+class QueryLogIndex:
+    """Index the query log entries seen within a time window.
+
+    Entries live in parallel arrays addressed by an absolute sequence number.
+    Domains and devices map to postings lists of sequence numbers, and each
+    status has a bitmap over the sequence numbers, so counts and lookups
+    never scan the whole window. Entries older than the window are evicted
+    from the front and the arrays are compacted in bulk.
+    """
+
+    def __init__(self, window: float) -> None:
+        """Initialize the index with a window length in seconds."""
+        self.window = window
+        self._base = 0  # sequence number of array position 0
+        self._head = 0  # array position of the oldest live entry
+        self._times = array("d")
+        self._domains = array("I")
+        self._devices = array("I")
+        self._statuses = bytearray()
+        self._bitmaps = [0] * len(STATUSES)
+        self._bitmap_len = 0  # number of array positions covered by the bitmaps
+        self._domain_index = _Interner()
+        self._device_index = _Interner()
+        # Domains by reversed labels for wildcard searches, built on the first
+        # one and then kept sorted, with domains added since the last merge
+        self._reversed_domains: list[tuple[str, int]] | None = None
+        self._new_domains: list[tuple[str, int]] = []
+        self.last_time = 0.0
+
+    def __len__(self) -> int:
+        """Return the number of live entries."""
+        return len(self._times) - self._head
+
+    @property
+    def oldest_time(self) -> float | None:
+        """Return the timestamp of the oldest live entry."""
+        return self._times[self._head] if len(self) else None
+
+    def add_items(self, items: Iterable[dict[str, Any]]) -> int:
+        """Add query log items, returning how many were new.
+
+        Items are sorted by time and anything older than the newest indexed
+        entry is skipped, so overlapping pages can be fed in safely.
+        """
+        added = 0
+        for item in sorted(items, key=lambda item: item.get("time_millis", 0)):
+            timestamp = item.get("time_millis", 0) / 1000
+            if timestamp < self.last_time:
+                continue
+            self.add(
+                timestamp,
+                item.get("domain", "").rstrip(".").lower(),
+                item.get("device_id", ""),
+                query_status(item),
+            )
+            added += 1
+        self._update_bitmaps()
+        self._merge_new_domains()
+        return added
+
+    def add(self, timestamp: float, domain: str, device_id: str, status: str) -> None:
+        """Append a single entry. Entries must arrive in time order."""
+        seq = self._base + len(self._times)
+        status_code = STATUSES.index(status)
+        new_domain = domain not in self._domain_index.ids
+        domain_id = self._domain_index.add(domain, seq)
+        if new_domain and self._reversed_domains is not None:
+            self._new_domains.append((_reverse_labels(domain), domain_id))
+        self._times.append(timestamp)
+        self._domains.append(domain_id)
+        self._devices.append(self._device_index.add(device_id, seq))
+        self._statuses.append(status_code)
+        self.last_time = timestamp
+
+    def _update_bitmaps(self) -> None:
+        """Extend the status bitmaps over entries added since the last call.
+
+        New entries are folded in with a single shift-and-or per status, as
+        setting bits one by one would copy the whole bitmap for every entry.
+        """
+        if self._bitmap_len == len(self._statuses):
+            return
+        new_statuses = self._statuses[self._bitmap_len:]
+        new_statuses.reverse()
+        for status_code, table in enumerate(_BIT_TABLES):
+            bits = int(new_statuses.translate(table), 2)
+            self._bitmaps[status_code] |= bits << self._bitmap_len
+        self._bitmap_len = len(self._statuses)
+
+    def evict(self, now: float) -> None:
+        """Drop entries that fell out of the window."""
+        self._head = bisect_left(self._times, now - self.window, self._head)
+        if self._head >= _COMPACT_MIN and self._head * 2 >= len(self._times):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Release the storage of evicted entries."""
+        self._update_bitmaps()
+        head = self._head
+        del self._times[:head]
+        del self._domains[:head]
+        del self._devices[:head]
+        del self._statuses[:head]
+        self._bitmaps = [bitmap >> head for bitmap in self._bitmaps]
+        self._bitmap_len -= head
+        self._base += head
+        self._head = 0
+        if (freed := self._domain_index.trim(self._base)) and self._reversed_domains is not None:
+            self._merge_new_domains()
+            self._reversed_domains = [
+                entry for entry in self._reversed_domains if entry[1] not in freed
+            ]
+        self._device_index.trim(self._base)
+
+    def _merge_new_domains(self) -> None:
+        """Fold the domains added since the last merge into the sorted list.
+
+        A batch of a few domains is inserted in place. Larger ones are
+        appended and sorted, which merges the two sorted runs in linear time.
+        """
+        if not self._new_domains:
+            return
+        if len(self._new_domains) <= 8:
+            for entry in self._new_domains:
+                insort(self._reversed_domains, entry)
+        else:
+            self._new_domains.sort()
+            self._reversed_domains.extend(self._new_domains)
+            self._reversed_domains.sort()
+        self._new_domains = []
+
+    def _matching_domains(self, pattern: str) -> list[int]:
+        """Return the domain IDs matching a name or a *.suffix wildcard.
+
+        A wildcard matches the suffix itself and every subdomain of it.
+        """
+        pattern = pattern.rstrip(".").lower()
+        if not pattern.startswith("*."):
+            ident = self._domain_index.ids.get(pattern)
+            return [] if ident is None else [ident]
+
+        if self._reversed_domains is None:
+            self._reversed_domains = sorted(
+                (_reverse_labels(name), ident) for name, ident in self._domain_index.ids.items()
+            )
+        else:
+            self._merge_new_domains()
+        reversed_suffix = _reverse_labels(pattern[2:])
+        prefix = reversed_suffix + "."
+        names = self._reversed_domains
+        matches = []
+        for position in range(bisect_left(names, (reversed_suffix,)), len(names)):
+            name, ident = names[position]
+            if name != reversed_suffix and not name.startswith(prefix):
+                break
+            matches.append(ident)
+        return matches
+
+    def search(
+        self,
+        domain: str | None = None,
+        device_id: str | None = None,
+        status: str | None = None,
+        since: float | None = None,
+        limit: int = 0,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Count the entries matching every given filter.
+
+        Returns the count and up to limit of the newest matching entries.
+        """
+        start = self._head
+        if since is not None:
+            start = bisect_left(self._times, since, self._head)
+        first_seq = self._base + start
+        status_code = None if status is None else STATUSES.index(status)
+
+        if domain is None and device_id is None:
+            if status_code is None:
+                count = len(self._times) - start
+                positions = range(len(self._times) - 1, start - 1, -1)
+            else:
+                self._update_bitmaps()
+                count = (self._bitmaps[status_code] >> start).bit_count()
+                positions = (
+                    position
+                    for position in range(len(self._times) - 1, start - 1, -1)
+                    if self._statuses[position] == status_code
+                )
+            matches = []
+            if limit:
+                for position in positions:
+                    matches.append(self._entry(position))
+                    if len(matches) >= limit:
+                        break
+            return count, matches
+
+        # Walk the postings of the most selective key and filter on the rest
+        candidates: list[array] = []
+        device_ident = None
+        if device_id is not None:
+            device_ident = self._device_index.ids.get(device_id)
+            if device_ident is None:
+                return 0, []
+        if domain is not None:
+            domain_idents = self._matching_domains(domain)
+            if not domain_idents:
+                return 0, []
+            candidates = [self._domain_index.postings[ident] for ident in domain_idents]
+        if device_ident is not None and (
+            not candidates
+            or len(self._device_index.postings[device_ident]) < sum(map(len, candidates))
+        ):
+            candidates = [self._device_index.postings[device_ident]]
+            device_ident = None
+            domain_filter = None if domain is None else set(domain_idents)
+        else:
+            domain_filter = None
+
+        positions_list: list[int] = []
+        for postings in candidates:
+            for seq in postings[bisect_left(postings, first_seq):]:
+                position = seq - self._base
+                if status_code is not None and self._statuses[position] != status_code:
+                    continue
+                if device_ident is not None and self._devices[position] != device_ident:
+                    continue
+                if domain_filter is not None and self._domains[position] not in domain_filter:
+                    continue
+                positions_list.append(position)
+
+        if len(candidates) > 1:
+            positions_list.sort()
+        matches = [self._entry(position) for position in reversed(positions_list[-limit:])] if limit else []
+        return len(positions_list), matches
+
+    def _entry(self, position: int) -> dict[str, Any]:
+        """Return the entry stored at an array position."""
+        return {
+            "time": self._times[position],
+            "domain": self._domain_index.names[self._domains[position]],
+            "device_id": self._device_index.names[self._devices[position]],
+            "status": STATUSES[self._statuses[position]],
+        }
@@ -0,0 +1,145 @@
+"""Query and block rates over sliding windows from ring-buffered counters."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Mapping
+
+from .anomaly import METRICS
+
+
+class RateWindow:
+    """A ring of counter samples covering one window, shared by all series.
+
+    Samples are kept at most every window / size seconds, so a day long
+    window costs the same memory as a five minute one. Every series is
+    sampled at the same times, so the sample a rate is measured from is
+    found once per update for all of them.
+    """
+
+    def __init__(self, seconds: float, size: int) -> None:
+        """Initialize the window."""
+        self.seconds = seconds
+        self.interval = seconds / size
+        # One extra sample so a full window still has one at or before its start
+        self.capacity = size + 2
+        self.times = array("d", [0.0] * self.capacity)
+        self.values = array("d")  # (series * capacity + position) * len(METRICS) + metric
+        self.count = 0
+        self.head = 0  # position of the next sample
+
+    def resize(self, series: int) -> None:
+        """Grow the ring to hold the given number of series."""
+        missing = series * self.capacity * len(METRICS) - len(self.values)
+        if missing > 0:
+            self.values.extend([0.0] * missing)
+
+    def fill(self, series: int, totals: array) -> None:
+        """Set every sample of a series to its current totals."""
+        start = series * self.capacity * len(METRICS)
+        current = totals[series * len(METRICS):(series + 1) * len(METRICS)]
+        self.values[start:start + self.capacity * len(METRICS)] = current * self.capacity
+
+    def record(self, now: float, totals: array, series: int) -> None:
+        """Store a sample of all series if the sampling interval has passed."""
+        if self.count and now - self.times[(self.head - 1) % self.capacity] < self.interval:
+            return
+        position = self.head
+        self.times[position] = now
+        step = self.capacity * len(METRICS)
+        offset = position * len(METRICS)
+        for start in range(series):
+            source = start * len(METRICS)
+            target = start * step + offset
+            self.values[target:target + len(METRICS)] = totals[source:source + len(METRICS)]
+        self.head = (position + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def base(self, now: float) -> int | None:
+        """Return the position rates are measured from.
+
+        That is the newest sample at or before the start of the window, or
+        the oldest one while there is less history than the window.
+        """
+        if self.count < 2:
+            return None
+        oldest = (self.head - self.count) % self.capacity
+        base = oldest
+        for age in range(1, self.count - 1):
+            position = (oldest + age) % self.capacity
+            if self.times[position] > now - self.seconds:
+                break
+            base = position
+        return base
+
+
+class RateTracker:
+    """Per-minute query and block rates of the account and each device.
+
+    Series 0 is the whole account and series slot + 1 is the device in
+    that slot. Totals are counters with API resets removed, updated in
+    place by the caller, so they only ever grow and a rate is a plain
+    difference between two samples.
+    """
+
+    def __init__(self, windows: Mapping[str, float], size: int) -> None:
+        """Initialize the tracker."""
+        self.windows = [RateWindow(seconds, size) for seconds in windows.values()]
+        self.totals = array("d")  # series * len(METRICS) + metric
+        self._since = array("d")
+        self._series = 0
+
+    def resize(self, series: int) -> None:
+        """Grow the arrays to hold the given number of series."""
+        if series <= self._series:
+            return
+        missing = series - self._series
+        self.totals.extend([0.0] * (missing * len(METRICS)))
+        self._since.extend([0.0] * missing)
+        for window in self.windows:
+            window.resize(series)
+        self._series = series
+
+    def reset(self, series: int, now: float) -> None:
+        """Start a series over, forgetting the history of its previous device."""
+        start = series * len(METRICS)
+        self.totals[start:start + len(METRICS)] = array("d", [0.0] * len(METRICS))
+        self._since[series] = now
+        for window in self.windows:
+            window.fill(series, self.totals)
+
+    def update(self, now: float, series_ids: list[int]) -> list[tuple[float | None, ...]]:
+        """Sample the totals and return the rates of the given series.
+
+        Each rate tuple holds the rate of every window for the first
+        metric, then for the second one.
+        """
+        for window in self.windows:
+            window.record(now, self.totals, self._series)
+        metrics = len(METRICS)
+        bases = []
+        for window in self.windows:
+            if (base := window.base(now)) is not None:
+                bases.append((window.values, window.capacity * metrics, base * metrics, window.times[base]))
+            else:
+                bases.append(None)
+
+        totals = self.totals
+        rates = []
+        for series in series_ids:
+            since = self._since[series]
+            values: list[float | None] = []
+            for metric in range(metrics):
+                current = totals[series * metrics + metric]
+                for window in bases:
+                    if window is None:
+                        values.append(None)
+                        continue
+                    samples, stride, offset, start = window
+                    elapsed = now - (start if start > since else since)
+                    if elapsed <= 0:
+                        values.append(None)
+                        continue
+                    previous = samples[series * stride + offset + metric]
+                    values.append(round((current - previous) * 60 / elapsed, 2))
+            rates.append(tuple(values))
+        return rates
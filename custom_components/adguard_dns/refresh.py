@@ -0,0 +1,102 @@
+"""On-demand refresh coalescing for AdGuard DNS."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+import logging
+from time import monotonic
+from typing import TYPE_CHECKING
+
+from .const import ENDPOINT_GROUPS
+
+if TYPE_CHECKING:
+    from .coordinator import AdGuardDNSDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RefreshCoalescer:
+    """Share in-flight refreshes between callers and rate limit them per account.
+
+    Callers asking for groups that are already being refreshed, by this
+    coalescer or by a regular poll, wait on that refresh instead of starting
+    a new one. Groups refreshed less than cooldown seconds ago, by any path
+    including regular polling, are skipped.
+    """
+
+    def __init__(
+        self, coordinator: AdGuardDNSDataUpdateCoordinator, cooldown: float
+    ) -> None:
+        """Initialize the coalescer."""
+        self._coordinator = coordinator
+        self._cooldown = cooldown
+        self._in_flight: dict[asyncio.Future[None], frozenset[str]] = {}
+        self._refreshed_at: dict[str, float] = {}
+
+    def mark_refreshed(self, groups: Iterable[str]) -> None:
+        """Record the groups that were fetched successfully."""
+        now = monotonic()
+        for group in groups:
+            self._refreshed_at[group] = now
+
+    @contextmanager
+    def in_flight(self, groups: Iterable[str]) -> Iterator[None]:
+        """Mark groups as being refreshed for callers to join until the block exits."""
+        future = self._mark_in_flight(groups)
+        try:
+            yield
+        finally:
+            self._clear_in_flight(future)
+
+    def _mark_in_flight(self, groups: Iterable[str]) -> asyncio.Future[None]:
+        """Mark groups as being refreshed, returning the future to clear."""
+        future: asyncio.Future[None] = self._coordinator.hass.loop.create_future()
+        self._in_flight[future] = frozenset(groups)
+        return future
+
+    def _clear_in_flight(self, future: asyncio.Future[None]) -> None:
+        """Release the callers waiting on a finished refresh."""
+        del self._in_flight[future]
+        future.set_result(None)
+
+    async def async_refresh(self, groups: Iterable[str] | None = None) -> frozenset[str]:
+        """Refresh endpoint groups, returning the groups this call fetched."""
+        requested = frozenset(groups or ENDPOINT_GROUPS)
+
+        # Piggyback on refreshes already in flight. Another caller may start a
+        # new refresh while we wait, so check again after each one finishes.
+        while requested and (
+            joined := next(
+                (
+                    (future, in_flight_groups)
+                    for future, in_flight_groups in self._in_flight.items()
+                    if requested & in_flight_groups
+                ),
+                None,
+            )
+        ):
+            future, in_flight_groups = joined
+            await asyncio.shield(future)
+            requested -= in_flight_groups
+        if not requested:
+            return frozenset()
+
+        now = monotonic()
+        due = frozenset(
+            group
+            for group in requested
+            if now - self._refreshed_at.get(group, float("-inf")) >= self._cooldown
+        )
+        if not due:
+            _LOGGER.debug("Skipping refresh of %s, still in cooldown", ", ".join(sorted(requested)))
+            return frozenset()
+
+        future = self._mark_in_flight(due)
+        task = self._coordinator.hass.async_create_task(
+            self._coordinator.async_refresh_groups(due),
+            f"{self._coordinator.name} refresh",
+        )
+        task.add_done_callback(lambda _: self._clear_in_flight(future))
+        await asyncio.shield(task)
+        return due
@@ -0,0 +1,214 @@
+"""Filter list and user rule ingestion for AdGuard DNS servers."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+import hashlib
+import ipaddress
+from typing import Any
+
+from .const import FILTER_LISTS_PATH, USER_RULES_PATH
+
+RULE_BLOCKING = "blocking"
+RULE_ALLOWLIST = "allowlist"
+RULE_REGEX = "regex"
+RULE_HOSTS = "hosts"
+RULE_TYPES = (RULE_BLOCKING, RULE_ALLOWLIST, RULE_REGEX, RULE_HOSTS)
+
+
+def rule_type(rule: str) -> str | None:
+    """Return the type of an AdGuard DNS filtering rule, None for comments."""
+    if not rule or rule[0] in "!#":
+        return None
+    if rule.startswith("@@"):
+        return RULE_ALLOWLIST
+    if len(rule) > 1 and rule[0] == "/" and (rule.endswith("/") or "/$" in rule[1:]):
+        return RULE_REGEX
+    address, _, host = rule.partition(" ")
+    if host.strip():
+        try:
+            ipaddress.ip_address(address)
+        except ValueError:
+            pass
+        else:
+            return RULE_HOSTS
+    return RULE_BLOCKING
+
+
+def server_rules(server: dict[str, Any]) -> tuple[list[str], list[Any]]:
+    """Return the user rules and the enabled filter list IDs of a DNS server."""
+    settings = server.get("settings") or {}
+    rules: Any = settings
+    for key in USER_RULES_PATH:
+        rules = rules.get(key) if isinstance(rules, dict) else None
+    filter_lists: Any = settings
+    for key in FILTER_LISTS_PATH:
+        filter_lists = filter_lists.get(key) if isinstance(filter_lists, dict) else None
+    return (
+        [rule.strip() for rule in rules or () if isinstance(rule, str)],
+        [
+            filter_list.get("filter_id")
+            for filter_list in filter_lists or ()
+            if isinstance(filter_list, dict) and filter_list.get("enabled", True)
+        ],
+    )
+
+
+def content_hash(rules: list[str], filter_lists: list[Any]) -> str:
+    """Return a hash of a server's rules and filter lists."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\n".join(map(str, filter_lists)).encode())
+    digest.update(b"\0")
+    digest.update("\n".join(rules).encode())
+    return digest.hexdigest()
+
+
+class RuleTable:
+    """Intern rule strings shared by all servers as small integer IDs.
+
+    A rule used by several servers is stored once. IDs whose last user
+    goes away are recycled.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the table."""
+        self.ids: dict[str, int] = {}
+        self.rules: list[str] = []
+        self._users = array("I")
+        self._free: list[int] = []
+
+    def __len__(self) -> int:
+        """Return the number of distinct rules in use."""
+        return len(self.ids)
+
+    def acquire(self, rules: Iterable[str]) -> array:
+        """Return the IDs of rules, counting a new user of each."""
+        idents = array("I")
+        for rule in rules:
+            ident = self.ids.get(rule)
+            if ident is None:
+                if self._free:
+                    ident = self._free.pop()
+                    self.rules[ident] = rule
+                else:
+                    ident = len(self.rules)
+                    self.rules.append(rule)
+                    self._users.append(0)
+                self.ids[rule] = ident
+            self._users[ident] += 1
+            idents.append(ident)
+        return idents
+
+    def release(self, idents: Iterable[int]) -> None:
+        """Drop one user of each rule ID."""
+        for ident in idents:
+            self._users[ident] -= 1
+            if not self._users[ident]:
+                del self.ids[self.rules[ident]]
+                self.rules[ident] = ""
+                self._free.append(ident)
+
+
+@dataclass(slots=True)
+class ServerRules:
+    """The parsed rules of one DNS server."""
+
+    content_hash: str
+    rule_ids: array
+    counts: dict[str, int]
+
+
+@dataclass(slots=True)
+class RulesChange:
+    """How the rules of a DNS server changed."""
+
+    dns_server_id: str
+    counts: dict[str, int]
+    added: int = 0
+    removed: int = 0
+    filter_lists: dict[str, list[Any]] = field(default_factory=dict)
+
+    def as_event_data(self) -> dict[str, Any]:
+        """Return the change as event data."""
+        data: dict[str, Any] = {
+            "dns_server_id": self.dns_server_id,
+            "counts": self.counts,
+            "added": self.added,
+            "removed": self.removed,
+        }
+        if self.filter_lists:
+            data["filter_lists"] = self.filter_lists
+        return data
+
+
+class RuleIndex:
+    """Keep the parsed rules of every DNS server between refreshes.
+
+    Servers whose content hash did not change are skipped, so a poll only
+    hashes the rules and never re-parses or re-counts them.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the index."""
+        self.table = RuleTable()
+        self.servers: dict[str, ServerRules] = {}
+        self._filter_lists: dict[str, list[Any]] = {}
+        self._loaded = False
+
+    def update(self, servers: Iterable[dict[str, Any]]) -> list[RulesChange] | None:
+        """Ingest the DNS servers of a refresh.
+
+        Returns the servers whose rules changed, or None for the first
+        refresh, which only sets the baseline.
+        """
+        changes: list[RulesChange] = []
+        seen = set()
+        for server in servers:
+            if not (server_id := server.get("id")):
+                continue
+            seen.add(server_id)
+            rules, filter_lists = server_rules(server)
+            digest = content_hash(rules, filter_lists)
+            current = self.servers.get(server_id)
+            if current is not None and current.content_hash == digest:
+                continue
+
+            parsed = [(rule, kind) for rule in rules if (kind := rule_type(rule))]
+            rule_ids = self.table.acquire(rule for rule, _ in parsed)
+            counts = dict.fromkeys(RULE_TYPES, 0)
+            for _, kind in parsed:
+                counts[kind] += 1
+            counts["total"] = len(rule_ids)
+            counts["filter_lists"] = len(filter_lists)
+            self.servers[server_id] = ServerRules(digest, rule_ids, counts)
+
+            old_filter_lists = self._filter_lists.get(server_id, [])
+            self._filter_lists[server_id] = filter_lists
+            change = RulesChange(server_id, counts)
+            if current is not None:
+                old, new = set(current.rule_ids), set(rule_ids)
+                change.added = len(new - old)
+                change.removed = len(old - new)
+                self.table.release(current.rule_ids)
+            else:
+                change.added = len(set(rule_ids))
+            if old_filter_lists != filter_lists:
+                change.filter_lists = {
+                    "added": [item for item in filter_lists if item not in old_filter_lists],
+                    "removed": [item for item in old_filter_lists if item not in filter_lists],
+                }
+            changes.append(change)
+
+        for server_id in self.servers.keys() - seen:
+            self.table.release(self.servers.pop(server_id).rule_ids)
+            self._filter_lists.pop(server_id, None)
+
+        if not self._loaded:
+            self._loaded = True
+            return None
+        return changes
+
+    def counts(self) -> dict[str, dict[str, int]]:
+        """Return the rule counts by DNS server ID."""
+        return {server_id: rules.counts for server_id, rules in self.servers.items()}
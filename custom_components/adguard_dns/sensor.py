@@ -9,13 +9,21 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import AdGuardDNSConfigEntry
-from .const import DOMAIN, SENSOR_TYPES
+from .const import (
+    DEVICE_ENTITIES_ENABLED_DEFAULT,
+    DEVICE_SENSOR_TYPES,
+    DOMAIN,
+    RATE_SENSOR_TYPES,
+    SENSOR_TYPES,
+    SERVER_SENSOR_TYPES,
+)
 from .coordinator import AdGuardDNSDataUpdateCoordinator
+from .rules import RULE_TYPES
 
 
 async def async_setup_entry(
@@ -29,9 +37,39 @@ async def async_setup_entry(
     entities = []
     for sensor_type in SENSOR_TYPES:
         entities.append(AdGuardDNSSensor(coordinator, sensor_type))
+    for sensor_type in RATE_SENSOR_TYPES:
+        entities.append(AdGuardDNSRateSensor(coordinator, sensor_type))
 
     async_add_entities(entities)
 
+    known_devices: set[str] = set()
+    known_servers: set[str] = set()
+
+    @callback
+    def _async_add_record_sensors() -> None:
+        """Add sensors for devices and DNS servers seen for the first time."""
+        data = coordinator.data or {}
+        new_devices = data.get("device_counters", {}).keys() - known_devices
+        new_servers = data.get("server_aggregates", {}).keys() - known_servers
+        if not new_devices and not new_servers:
+            return
+        known_devices.update(new_devices)
+        known_servers.update(new_servers)
+        new_entities: list[SensorEntity] = [
+            AdGuardDNSServerSensor(coordinator, server_id, sensor_type)
+            for server_id in new_servers
+            for sensor_type in SERVER_SENSOR_TYPES
+        ]
+        new_entities.extend(
+            AdGuardDNSDeviceSensor(coordinator, device_id, sensor_type)
+            for device_id in new_devices
+            for sensor_type in DEVICE_SENSOR_TYPES
+        )
+        async_add_entities(new_entities)
+
+    _async_add_record_sensors()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_record_sensors))
+
 
 class AdGuardDNSSensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], SensorEntity):
     """Representation of an AdGuard DNS sensor."""
@@ -82,44 +120,12 @@ class AdGuardDNSSensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], Senso
             return self.coordinator.data.get("blocked_percentage", 0)
         
         elif self._sensor_type == "top_blocked_domain":
-            # Get top blocked domain from devices data
-            devices_data = self.coordinator.data.get("devices", {})
-            devices_list = devices_data.get("devices", [])
-            
-            # Collect all blocked domains from all devices
-            blocked_domains = {}
-            for device in devices_list:
-                device_stats = device.get("statistics", {})
-                top_blocked = device_stats.get("top_blocked_domains", [])
-                for domain_info in top_blocked:
-                    domain = domain_info.get("domain", "")
-                    count = domain_info.get("count", 0)
-                    blocked_domains[domain] = blocked_domains.get(domain, 0) + count
-            
-            if blocked_domains:
-                top_domain = max(blocked_domains.items(), key=lambda x: x[1])
-                return top_domain[0]
-            return "N/A"
+            top_blocked = self.coordinator.data.get("top_blocked_domains", [])
+            return top_blocked[0][0] if top_blocked else "N/A"
         
         elif self._sensor_type == "top_queried_domain":
-            # Get top queried domain from devices data
-            devices_data = self.coordinator.data.get("devices", {})
-            devices_list = devices_data.get("devices", [])
-            
-            # Collect all queried domains from all devices
-            queried_domains = {}
-            for device in devices_list:
-                device_stats = device.get("statistics", {})
-                top_queried = device_stats.get("top_queried_domains", [])
-                for domain_info in top_queried:
-                    domain = domain_info.get("domain", "")
-                    count = domain_info.get("count", 0)
-                    queried_domains[domain] = queried_domains.get(domain, 0) + count
-            
-            if queried_domains:
-                top_domain = max(queried_domains.items(), key=lambda x: x[1])
-                return top_domain[0]
-            return "N/A"
+            top_queried = self.coordinator.data.get("top_queried_domains", [])
+            return top_queried[0][0] if top_queried else "N/A"
         
         return None
 
@@ -141,45 +147,186 @@ class AdGuardDNSSensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], Senso
             attributes["account_limits"] = account_limits
         
         elif self._sensor_type == "top_blocked_domain":
-            devices_data = self.coordinator.data.get("devices", {})
-            devices_list = devices_data.get("devices", [])
-            
-            # Collect all blocked domains from all devices
-            blocked_domains = {}
-            for device in devices_list:
-                device_stats = device.get("statistics", {})
-                top_blocked = device_stats.get("top_blocked_domains", [])
-                for domain_info in top_blocked:
-                    domain = domain_info.get("domain", "")
-                    count = domain_info.get("count", 0)
-                    blocked_domains[domain] = blocked_domains.get(domain, 0) + count
-            
-            if blocked_domains:
-                # Sort by count and get top 10
-                sorted_domains = sorted(blocked_domains.items(), key=lambda x: x[1], reverse=True)
-                top_domain = sorted_domains[0]
-                attributes["query_count"] = top_domain[1]
-                attributes["top_10_blocked"] = [domain for domain, _ in sorted_domains[:10]]
+            top_blocked = self.coordinator.data.get("top_blocked_domains", [])
+            if top_blocked:
+                attributes["query_count"] = top_blocked[0][1]
+                attributes["top_10_blocked"] = [domain for domain, _ in top_blocked]
         
         elif self._sensor_type == "top_queried_domain":
-            devices_data = self.coordinator.data.get("devices", {})
-            devices_list = devices_data.get("devices", [])
-            
-            # Collect all queried domains from all devices
-            queried_domains = {}
-            for device in devices_list:
-                device_stats = device.get("statistics", {})
-                top_queried = device_stats.get("top_queried_domains", [])
-                for domain_info in top_queried:
-                    domain = domain_info.get("domain", "")
-                    count = domain_info.get("count", 0)
-                    queried_domains[domain] = queried_domains.get(domain, 0) + count
-            
-            if queried_domains:
-                # Sort by count and get top 10
-                sorted_domains = sorted(queried_domains.items(), key=lambda x: x[1], reverse=True)
-                top_domain = sorted_domains[0]
-                attributes["query_count"] = top_domain[1]
-                attributes["top_10_queried"] = [domain for domain, _ in sorted_domains[:10]]
+            top_queried = self.coordinator.data.get("top_queried_domains", [])
+            if top_queried:
+                attributes["query_count"] = top_queried[0][1]
+                attributes["top_10_queried"] = [domain for domain, _ in top_queried]
         
-        return attributes if attributes else None
\ No newline at end of file
+        return attributes if attributes else None
+
+
+class AdGuardDNSRateSensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], SensorEntity):
+    """Queries or blocks per minute of the whole account over a window."""
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        sensor_type: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._index = RATE_SENSOR_TYPES[sensor_type]["index"]
+        self._attr_name = RATE_SENSOR_TYPES[sensor_type]["name"]
+        self._attr_unique_id = f"{DOMAIN}_{sensor_type}"
+        self._attr_icon = RATE_SENSOR_TYPES[sensor_type]["icon"]
+        self._attr_native_unit_of_measurement = RATE_SENSOR_TYPES[sensor_type]["unit"]
+        self._attr_state_class = SensorStateClass(RATE_SENSOR_TYPES[sensor_type]["state_class"])
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        return {
+            "identifiers": {(DOMAIN, "adguard_dns")},
+            "name": "AdGuard DNS",
+            "manufacturer": "AdGuard",
+            "model": "DNS Service",
+            "sw_version": "1.0",
+        }
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the rate, unknown until two samples were taken."""
+        rates = self.coordinator.data.get("rates") if self.coordinator.data else None
+        return rates[self._index] if rates else None
+
+
+class AdGuardDNSServerSensor(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], SensorEntity):
+    """Totals over the devices of a single DNS server."""
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        server_id: str,
+        sensor_type: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._server_id = server_id
+        self._sensor_type = sensor_type
+        self._source = SERVER_SENSOR_TYPES[sensor_type]["source"]
+        self._key = SERVER_SENSOR_TYPES[sensor_type]["key"]
+
+        server_name = coordinator.get_record("dns_servers", server_id).get("name", server_id)
+        self._attr_name = f"AdGuard DNS {server_name} {SERVER_SENSOR_TYPES[sensor_type]['name']}"
+        self._attr_unique_id = f"{DOMAIN}_dns_server_{server_id}_{sensor_type}"
+        self._attr_icon = SERVER_SENSOR_TYPES[sensor_type]["icon"]
+        self._attr_native_unit_of_measurement = SERVER_SENSOR_TYPES[sensor_type]["unit"]
+        self._attr_state_class = SensorStateClass(SERVER_SENSOR_TYPES[sensor_type]["state_class"])
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        server = self.coordinator.get_record("dns_servers", self._server_id)
+        return {
+            "identifiers": {(DOMAIN, f"dns_server_{self._server_id}")},
+            "name": server.get("name", self._server_id),
+            "manufacturer": "AdGuard DNS",
+            "model": "DNS Server",
+            "via_device": (DOMAIN, "adguard_dns"),
+        }
+
+    @property
+    def _values(self) -> dict[str, Any] | None:
+        """Return this server's precomputed values."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.get(self._source, {}).get(self._server_id)
+
+    @property
+    def available(self) -> bool:
+        """Return if the coordinator is up and the server still exists."""
+        return super().available and self._values is not None
+
+    @property
+    def native_value(self) -> int | float | None:
+        """Return the state of the sensor."""
+        values = self._values
+        return values[self._key] if values is not None else None
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the dedicated addresses or the rule breakdown."""
+        values = self._values
+        if not values:
+            return None
+        if self._sensor_type == "device_count" and values["dedicated_ipv4"]:
+            return {"dedicated_ipv4": values["dedicated_ipv4"]}
+        if self._sensor_type == "user_rules":
+            return {rule_type: values[rule_type] for rule_type in RULE_TYPES}
+        return None
+
+
+class AdGuardDNSDeviceSensor(SensorEntity):
+    """Query statistics of a single device.
+
+    Unlike the account sensors this does not listen to every coordinator
+    update, it is only written when its own device's counters or rates,
+    whichever it shows, change.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        device_id: str,
+        sensor_type: str,
+    ) -> None:
+        """Initialize the sensor."""
+        self.coordinator = coordinator
+        self._device_id = device_id
+        self._source = DEVICE_SENSOR_TYPES[sensor_type]["source"]
+        self._index = DEVICE_SENSOR_TYPES[sensor_type]["index"]
+
+        device_name = coordinator.get_record("devices", device_id).get("name", device_id)
+        self._attr_name = f"AdGuard DNS {device_name} {DEVICE_SENSOR_TYPES[sensor_type]['name']}"
+        self._attr_unique_id = f"{DOMAIN}_device_{device_id}_{sensor_type}"
+        self._attr_icon = DEVICE_SENSOR_TYPES[sensor_type]["icon"]
+        self._attr_native_unit_of_measurement = DEVICE_SENSOR_TYPES[sensor_type]["unit"]
+        self._attr_state_class = SensorStateClass(DEVICE_SENSOR_TYPES[sensor_type]["state_class"])
+        self._attr_entity_registry_enabled_default = DEVICE_ENTITIES_ENABLED_DEFAULT
+
+    async def async_added_to_hass(self) -> None:
+        """Subscribe to updates of this device."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_device_listener(
+                self._device_id, self.async_write_ha_state, self._source
+            )
+        )
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        device = self.coordinator.get_record("devices", self._device_id)
+        return {
+            "identifiers": {(DOMAIN, f"device_{self._device_id}")},
+            "name": device.get("name", self._device_id),
+            "manufacturer": "AdGuard DNS",
+            "model": "Tracked Device",
+            "via_device": (DOMAIN, "adguard_dns"),
+        }
+
+    @property
+    def _values(self) -> tuple[int | float | None, ...] | None:
+        """Return this device's slice of the current data."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.get(self._source, {}).get(self._device_id)
+
+    @property
+    def available(self) -> bool:
+        """Return if the coordinator is up and the device still exists."""
+        return self.coordinator.last_update_success and self._values is not None
+
+    @property
+    def native_value(self) -> int | float | None:
+        """Return the state of the sensor."""
+        values = self._values
+        return values[self._index] if values is not None else None
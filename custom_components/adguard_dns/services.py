@@ -0,0 +1,304 @@
+"""Services for the AdGuard DNS integration."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+import logging
+from typing import TYPE_CHECKING
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_DEVICE_ID,
+    ATTR_DNS_SERVER_ID,
+    ATTR_DOMAIN,
+    ATTR_ENABLED,
+    ATTR_END,
+    ATTR_FILENAME,
+    ATTR_FORMAT,
+    ATTR_GROUPS,
+    ATTR_LIMIT,
+    ATTR_REFRESHES,
+    ATTR_START,
+    ATTR_STATUS,
+    ATTR_WITHIN,
+    DOMAIN,
+    ENDPOINT_GROUPS,
+    EXPORT_FORMATS,
+    MAX_PROFILE_REFRESHES,
+    SERVICE_EXPORT_QUERY_LOG,
+    SERVICE_PROFILE,
+    SERVICE_REFRESH,
+    SERVICE_SEARCH_QUERY_LOG,
+    SERVICE_SET_FILTERING,
+    SERVICE_SET_PROTECTION,
+)
+
+from .export import async_export_query_log
+from .query_index import STATUSES
+
+if TYPE_CHECKING:
+    from .coordinator import AdGuardDNSDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+SET_CONTROL_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_ENABLED): cv.boolean,
+            vol.Optional(ATTR_DNS_SERVER_ID): vol.All(
+                cv.ensure_list, [cv.string], vol.Length(min=1)
+            ),
+            vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [cv.string], vol.Length(min=1)),
+            vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_DNS_SERVER_ID, ATTR_DEVICE_ID),
+)
+
+REFRESH_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_GROUPS): vol.All(cv.ensure_list, [vol.In(ENDPOINT_GROUPS)]),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+EXPORT_QUERY_LOG_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+        vol.Optional(ATTR_FORMAT, default="ndjson"): vol.In(EXPORT_FORMATS),
+        vol.Optional(ATTR_FILENAME): cv.string,
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_REFRESHES, default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_PROFILE_REFRESHES)
+        ),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+SEARCH_QUERY_LOG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DOMAIN): cv.string,
+        vol.Optional(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_STATUS): vol.In(STATUSES),
+        vol.Optional(ATTR_WITHIN): cv.positive_time_period,
+        vol.Optional(ATTR_LIMIT, default=10): vol.All(vol.Coerce(int), vol.Range(min=0, max=1000)),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+# Service name -> control toggled by it
+CONTROL_SERVICES = {
+    SERVICE_SET_PROTECTION: "protection",
+    SERVICE_SET_FILTERING: "filtering",
+}
+
+
+def get_coordinators(
+    hass: HomeAssistant, config_entry_id: str | None = None
+) -> list[AdGuardDNSDataUpdateCoordinator]:
+    """Return the coordinators of loaded config entries."""
+    coordinators = [
+        entry.runtime_data
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.state is ConfigEntryState.LOADED
+        and (config_entry_id is None or entry.entry_id == config_entry_id)
+    ]
+    if not coordinators:
+        raise HomeAssistantError("No loaded AdGuard DNS config entry found")
+    return coordinators
+
+
+def get_coordinator(
+    hass: HomeAssistant, config_entry_id: str | None = None
+) -> AdGuardDNSDataUpdateCoordinator:
+    """Return the coordinator of the one loaded config entry, or the one given."""
+    coordinators = get_coordinators(hass, config_entry_id)
+    if len(coordinators) > 1:
+        raise HomeAssistantError("Several AdGuard DNS accounts are loaded, set config_entry_id")
+    return coordinators[0]
+
+
+async def _async_set_control(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Handle the set_protection and set_filtering services."""
+    control = CONTROL_SERVICES[call.service]
+    enabled = call.data[ATTR_ENABLED]
+    targets = {
+        "dns_servers": call.data.get(ATTR_DNS_SERVER_ID, []),
+        "devices": call.data.get(ATTR_DEVICE_ID, []),
+    }
+
+    # Resolve every ID before starting any write, so nothing is written on error
+    batches = []
+    unknown = {record_id for record_ids in targets.values() for record_id in record_ids}
+    for coordinator in get_coordinators(hass, call.data.get(ATTR_CONFIG_ENTRY_ID)):
+        for resource, record_ids in targets.items():
+            owned = [
+                record_id
+                for record_id in record_ids
+                if coordinator.get_record(resource, record_id)
+            ]
+            if owned:
+                unknown.difference_update(owned)
+                batches.append((coordinator, resource, owned))
+
+    if unknown:
+        raise HomeAssistantError(f"Unknown AdGuard DNS IDs: {', '.join(sorted(unknown))}")
+
+    results = await asyncio.gather(
+        *(
+            coordinator.async_set_control(resource, control, enabled, owned)
+            for coordinator, resource, owned in batches
+        ),
+        return_exceptions=True,
+    )
+    errors = [str(result) for result in results if isinstance(result, Exception)]
+    if errors:
+        raise HomeAssistantError("; ".join(errors))
+
+
+async def _async_refresh(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Handle the refresh service through each account's shared coalescer."""
+    await asyncio.gather(
+        *(
+            coordinator.refresh_coalescer.async_refresh(
+                call.data.get(ATTR_GROUPS, coordinator.options.get("refresh_groups"))
+            )
+            for coordinator in get_coordinators(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        )
+    )
+
+
+async def _async_profile(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Handle the profile service, profiling a refresh right away and the next polls."""
+    coordinators = get_coordinators(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+    for coordinator in coordinators:
+        coordinator.profiler.request(call.data[ATTR_REFRESHES])
+    await asyncio.gather(*(coordinator.async_refresh() for coordinator in coordinators))
+
+
+def _as_aware(value: datetime) -> datetime:
+    """Interpret naive service datetimes in the Home Assistant time zone."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=dt_util.get_default_time_zone())
+    return value
+
+
+async def _async_export_query_log(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Handle the export_query_log service."""
+    coordinator = get_coordinator(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+
+    start = _as_aware(call.data[ATTR_START])
+    end = _as_aware(call.data[ATTR_END]) if ATTR_END in call.data else dt_util.now()
+    if end <= start:
+        raise HomeAssistantError("The export end must be after its start")
+
+    export_format = call.data[ATTR_FORMAT]
+    filename = call.data.get(
+        ATTR_FILENAME,
+        f"query_log_{start:%Y%m%dT%H%M%S}_{end:%Y%m%dT%H%M%S}.{export_format}.gz",
+    )
+    return await async_export_query_log(
+        hass, coordinator, start, end, export_format, filename
+    )
+
+
+async def _async_search_query_log(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Handle the search_query_log service from the local query log indexes."""
+    indexes = [
+        coordinator.query_index
+        for coordinator in get_coordinators(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+        if coordinator.query_index is not None
+    ]
+    if not indexes:
+        raise HomeAssistantError(
+            "The query log index is disabled, set a query log window in the integration options"
+        )
+
+    since = None
+    if ATTR_WITHIN in call.data:
+        since = (dt_util.utcnow() - call.data[ATTR_WITHIN]).timestamp()
+    limit = call.data[ATTR_LIMIT]
+
+    count = 0
+    matches: list[dict] = []
+    for index in indexes:
+        index_count, index_matches = index.search(
+            domain=call.data.get(ATTR_DOMAIN),
+            device_id=call.data.get(ATTR_DEVICE_ID),
+            status=call.data.get(ATTR_STATUS),
+            since=since,
+            limit=limit,
+        )
+        count += index_count
+        matches.extend(index_matches)
+
+    matches.sort(key=lambda match: match["time"], reverse=True)
+    oldest = [index.oldest_time for index in indexes if index.oldest_time is not None]
+    return {
+        "count": count,
+        "matches": [
+            {**match, "time": dt_util.utc_from_timestamp(match["time"]).isoformat()}
+            for match in matches[:limit]
+        ],
+        "indexed_since": (
+            dt_util.utc_from_timestamp(min(oldest)).isoformat() if oldest else None
+        ),
+    }
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the AdGuard DNS services."""
+
+    async def _handle_set_control(call: ServiceCall) -> None:
+        await _async_set_control(hass, call)
+
+    async def _handle_refresh(call: ServiceCall) -> None:
+        await _async_refresh(hass, call)
+
+    async def _handle_profile(call: ServiceCall) -> None:
+        await _async_profile(hass, call)
+
+    async def _handle_export_query_log(call: ServiceCall) -> ServiceResponse:
+        return await _async_export_query_log(hass, call)
+
+    async def _handle_search_query_log(call: ServiceCall) -> ServiceResponse:
+        return await _async_search_query_log(hass, call)
+
+    for service in CONTROL_SERVICES:
+        hass.services.async_register(
+            DOMAIN, service, _handle_set_control, schema=SET_CONTROL_SCHEMA
+        )
+    hass.services.async_register(
+        DOMAIN, SERVICE_REFRESH, _handle_refresh, schema=REFRESH_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_PROFILE, _handle_profile, schema=PROFILE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_QUERY_LOG,
+        _handle_export_query_log,
+        schema=EXPORT_QUERY_LOG_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SEARCH_QUERY_LOG,
+        _handle_search_query_log,
+        schema=SEARCH_QUERY_LOG_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,114 @@
+"""Switch platform for AdGuard DNS."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.switch import SwitchEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from . import AdGuardDNSConfigEntry
+from .const import (
+    CONTROL_SETTINGS,
+    DEVICE_ENTITIES_ENABLED_DEFAULT,
+    DOMAIN,
+    SWITCH_TYPES,
+)
+from .coordinator import AdGuardDNSDataUpdateCoordinator, get_setting
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: AdGuardDNSConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Set up AdGuard DNS switches based on a config entry."""
+    coordinator = entry.runtime_data
+
+    known: dict[str, set[str]] = {"dns_servers": set(), "devices": set()}
+
+    @callback
+    def _async_add_record_switches() -> None:
+        """Add switches for devices and DNS servers seen for the first time."""
+        new_entities = []
+        for resource, known_ids in known.items():
+            for record in coordinator.get_records(resource):
+                record_id = record.get("id")
+                if not record_id or record_id in known_ids:
+                    continue
+                known_ids.add(record_id)
+                new_entities.extend(
+                    AdGuardDNSControlSwitch(coordinator, resource, record_id, switch_type)
+                    for switch_type in SWITCH_TYPES
+                )
+        if new_entities:
+            async_add_entities(new_entities)
+
+    _async_add_record_switches()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_record_switches))
+
+
+class AdGuardDNSControlSwitch(CoordinatorEntity[AdGuardDNSDataUpdateCoordinator], SwitchEntity):
+    """Switch toggling protection or filtering on a DNS server or device."""
+
+    def __init__(
+        self,
+        coordinator: AdGuardDNSDataUpdateCoordinator,
+        resource: str,
+        record_id: str,
+        switch_type: str,
+    ) -> None:
+        """Initialize the switch."""
+        super().__init__(coordinator)
+        self._resource = resource
+        self._record_id = record_id
+        self._switch_type = switch_type
+        self._prefix = "dns_server" if resource == "dns_servers" else "device"
+
+        record_name = coordinator.get_record(resource, record_id).get("name", record_id)
+        self._attr_name = f"AdGuard DNS {record_name} {SWITCH_TYPES[switch_type]['name']}"
+        self._attr_unique_id = f"{DOMAIN}_{self._prefix}_{record_id}_{switch_type}"
+        self._attr_icon = SWITCH_TYPES[switch_type]["icon"]
+        self._attr_entity_registry_enabled_default = (
+            resource == "dns_servers" or DEVICE_ENTITIES_ENABLED_DEFAULT
+        )
+
+    @property
+    def device_info(self) -> dict[str, Any]:
+        """Return device information."""
+        record = self.coordinator.get_record(self._resource, self._record_id)
+        return {
+            "identifiers": {(DOMAIN, f"{self._prefix}_{self._record_id}")},
+            "name": record.get("name", self._record_id),
+            "manufacturer": "AdGuard DNS",
+            "model": "DNS Server" if self._resource == "dns_servers" else "Tracked Device",
+            "via_device": (DOMAIN, "adguard_dns"),
+        }
+
+    @property
+    def available(self) -> bool:
+        """Return if the record still exists."""
+        return super().available and bool(
+            self.coordinator.get_record(self._resource, self._record_id)
+        )
+
+    @property
+    def is_on(self) -> bool | None:
+        """Return true if the setting is enabled."""
+        record = self.coordinator.get_record(self._resource, self._record_id)
+        value = get_setting(record.get("settings", {}), CONTROL_SETTINGS[self._switch_type])
+        return None if value is None else bool(value)
+
+    async def async_turn_on(self, **kwargs: Any) -> None:
+        """Enable the setting."""
+        await self.coordinator.async_set_control(
+            self._resource, self._switch_type, True, [self._record_id]
+        )
+
+    async def async_turn_off(self, **kwargs: Any) -> None:
+        """Disable the setting."""
+        await self.coordinator.async_set_control(
+            self._resource, self._switch_type, False, [self._record_id]
+        )
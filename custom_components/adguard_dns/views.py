@@ -0,0 +1,192 @@
+"""Tables served to dashboards, built from the precomputed data slices."""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from .const import RATE_SENSOR_TYPES
+
+TABLE_DEVICES = "devices"
+TABLE_SERVERS = "servers"
+TABLE_QUERIED_DOMAINS = "queried_domains"
+TABLE_BLOCKED_DOMAINS = "blocked_domains"
+
+DEVICE_COLUMNS = (
+    "id",
+    "name",
+    "device_type",
+    "dns_server_id",
+    "queries",
+    "blocked",
+    "blocked_percentage",
+    "home",
+    "last_seen",
+    "tracked",
+    *RATE_SENSOR_TYPES,
+)
+SERVER_COLUMNS = (
+    "id",
+    "name",
+    "device_count",
+    "queries",
+    "blocked",
+    "blocked_percentage",
+    "protection_enabled",
+    "filtering_enabled",
+    "user_rules",
+    "filter_lists",
+)
+DOMAIN_COLUMNS = ("id", "domain", "count")
+
+
+def device_rows(data: Mapping[str, Any]) -> list[dict[str, Any]]:
+    """Return one row per device with its counters, rates and presence."""
+    counters = data.get("device_counters", {})
+    rates = data.get("device_rates", {})
+    presence = data.get("device_presence", {})
+    tracked = data.get("tracked_devices")
+    rows = []
+    for device in data.get("devices", {}).get("devices", []):
+        if not (device_id := device.get("id")):
+            continue
+        queries, blocked, percentage = counters.get(device_id, (0, 0, 0))
+        device_rates = rates.get(device_id)
+        home, last_seen = presence.get(device_id, (False, None))
+        row = {
+            "id": device_id,
+            "name": device.get("name") or device_id,
+            "device_type": device.get("device_type", "UNKNOWN"),
+            "dns_server_id": device.get("dns_server_id"),
+            "queries": queries,
+            "blocked": blocked,
+            "blocked_percentage": percentage,
+            "home": home,
+            "last_seen": last_seen,
+            "tracked": tracked is None or device_id in tracked,
+        }
+        for key, info in RATE_SENSOR_TYPES.items():
+            row[key] = device_rates[info["index"]] if device_rates else None
+        rows.append(row)
+    return rows
+
+
+def server_rows(data: Mapping[str, Any]) -> list[dict[str, Any]]:
+    """Return one row per DNS server with its device totals and rule counts."""
+    aggregates = data.get("server_aggregates", {})
+    rules = data.get("server_rules", {})
+    rows = []
+    for server in data.get("dns_servers", {}).get("dns_servers", []):
+        if not (server_id := server.get("id")):
+            continue
+        aggregate = aggregates.get(server_id, {})
+        counts = rules.get(server_id, {})
+        rows.append(
+            {
+                "id": server_id,
+                "name": server.get("name") or server_id,
+                "device_count": aggregate.get("device_count", 0),
+                "queries": aggregate.get("queries", 0),
+                "blocked": aggregate.get("blocked", 0),
+                "blocked_percentage": aggregate.get("blocked_percentage", 0),
+                "protection_enabled": aggregate.get("protection_enabled"),
+                "filtering_enabled": aggregate.get("filtering_enabled"),
+                "user_rules": counts.get("total"),
+                "filter_lists": counts.get("filter_lists"),
+            }
+        )
+    return rows
+
+
+def _domain_rows(key: str) -> Callable[[Mapping[str, Any]], list[dict[str, Any]]]:
+    """Return a builder of domain rows from a domain count list."""
+
+    def build(data: Mapping[str, Any]) -> list[dict[str, Any]]:
+        return [
+            {"id": domain, "domain": domain, "count": count} for domain, count in data.get(key, [])
+        ]
+
+    return build
+
+
+# Table name to (row builder, column matched by the search text, columns)
+TABLES: dict[
+    str, tuple[Callable[[Mapping[str, Any]], list[dict[str, Any]]], str, tuple[str, ...]]
+] = {
+    TABLE_DEVICES: (device_rows, "name", DEVICE_COLUMNS),
+    TABLE_SERVERS: (server_rows, "name", SERVER_COLUMNS),
+    TABLE_QUERIED_DOMAINS: (_domain_rows("queried_domains"), "domain", DOMAIN_COLUMNS),
+    TABLE_BLOCKED_DOMAINS: (_domain_rows("blocked_domains"), "domain", DOMAIN_COLUMNS),
+}
+
+
+@dataclass(slots=True, frozen=True)
+class PageQuery:
+    """Filtering, sorting and paging of a table."""
+
+    table: str
+    search: str | None = None
+    filters: Mapping[str, Any] | None = None
+    sort: str | None = None
+    descending: bool = False
+    offset: int = 0
+    limit: int = 50
+
+    def unknown_columns(self) -> list[str]:
+        """Return the sort and filter columns the table does not have."""
+        columns = TABLES[self.table][2]
+        used = [*(self.filters or ()), *([self.sort] if self.sort else [])]
+        return [column for column in used if column not in columns]
+
+    def apply(self, rows: list[dict[str, Any]]) -> tuple[int, list[dict[str, Any]]]:
+        """Return the number of matching rows and the requested page of them."""
+        selected: Iterable[dict[str, Any]] = rows
+        if self.search:
+            column = TABLES[self.table][1]
+            text = self.search.casefold()
+            selected = (row for row in selected if text in str(row[column]).casefold())
+        if self.filters:
+            filters = list(self.filters.items())
+            selected = (
+                row for row in selected if all(row.get(key) == value for key, value in filters)
+            )
+        selected = list(selected)
+        if self.sort:
+            sort = self.sort
+            # Missing values sort last in either direction
+            present = [row for row in selected if row.get(sort) is not None]
+            present.sort(key=lambda row: row[sort], reverse=self.descending)
+            selected = present + [row for row in selected if row.get(sort) is None]
+        return len(selected), selected[self.offset:self.offset + self.limit]
+
+
+class PageSubscription:
+    """Track the page a subscriber last saw and diff the next one against it."""
+
+    def __init__(self, query: PageQuery) -> None:
+        """Initialize the subscription."""
+        self.query = query
+        self._rows: dict[str, dict[str, Any]] | None = None
+        self._order: list[str] = []
+        self._total = 0
+
+    def update(self, rows: list[dict[str, Any]]) -> dict[str, Any] | None:
+        """Return what changed on the page since the last update, None if nothing.
+
+        The first update returns the whole page.
+        """
+        total, page = self.query.apply(rows)
+        order = [row["id"] for row in page]
+        current = dict(zip(order, page))
+        if self._rows is None:
+            diff: dict[str, Any] = {"total": total, "rows": page, "order": order}
+        else:
+            upsert = [row for row_id, row in current.items() if self._rows.get(row_id) != row]
+            removed = [row_id for row_id in self._rows if row_id not in current]
+            if not upsert and not removed and order == self._order and total == self._total:
+                return None
+            diff = {"total": total, "upsert": upsert, "remove": removed}
+            if order != self._order:
+                diff["order"] = order
+        self._rows, self._order, self._total = current, order, total
+        return diff
@@ -0,0 +1,214 @@
+"""Websocket commands of the AdGuard DNS integration."""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .const import (
+    ATTR_CONFIG_ENTRY_ID,
+    ATTR_DEVICE_ID,
+    ATTR_DOMAIN,
+    ATTR_END,
+    ATTR_LIMIT,
+    ATTR_START,
+    ATTR_STATUS,
+    ATTR_WITHIN,
+    DOMAIN,
+    HISTORY_TIERS,
+)
+from .query_index import STATUSES
+from .services import get_coordinator
+from .views import TABLES, PageQuery, PageSubscription
+
+ATTR_TIER = "tier"
+ATTR_TABLE = "table"
+ATTR_SEARCH = "search"
+ATTR_FILTERS = "filters"
+ATTR_SORT = "sort"
+ATTR_DESCENDING = "descending"
+ATTR_OFFSET = "offset"
+
+# Rows returned in one page
+MAX_PAGE_SIZE = 500
+
+PAGE_SCHEMA = {
+    vol.Required(ATTR_TABLE): vol.In(list(TABLES)),
+    vol.Optional(ATTR_SEARCH): str,
+    vol.Optional(ATTR_FILTERS): {str: vol.Any(str, int, float, bool, None)},
+    vol.Optional(ATTR_SORT): str,
+    vol.Optional(ATTR_DESCENDING, default=False): bool,
+    vol.Optional(ATTR_OFFSET, default=0): vol.All(int, vol.Range(min=0)),
+    vol.Optional(ATTR_LIMIT, default=50): vol.All(int, vol.Range(min=1, max=MAX_PAGE_SIZE)),
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+}
+
+
+@callback
+def async_setup_websocket_api(hass: HomeAssistant) -> None:
+    """Register the websocket commands."""
+    websocket_api.async_register_command(hass, websocket_history)
+    websocket_api.async_register_command(hass, websocket_table)
+    websocket_api.async_register_command(hass, websocket_subscribe)
+    websocket_api.async_register_command(hass, websocket_query_log)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required(ATTR_TIER): vol.In(list(HISTORY_TIERS)),
+        vol.Optional(ATTR_DEVICE_ID): str,
+        vol.Optional(ATTR_START): vol.Coerce(float),
+        vol.Optional(ATTR_END): vol.Coerce(float),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+    }
+)
+@websocket_api.async_response
+async def websocket_history(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return the query history of the account or a device.
+
+    Times are Unix timestamps, the range defaults to all buckets the tier
+    keeps. Each point is [bucket start, queries, blocked].
+    """
+    tier = msg[ATTR_TIER]
+    end = msg.get(ATTR_END, time.time())
+    bucket, rows = HISTORY_TIERS[tier]
+    start = msg.get(ATTR_START, end - bucket * rows)
+    try:
+        coordinator = get_coordinator(hass, msg.get(ATTR_CONFIG_ENTRY_ID))
+        points = await coordinator.async_read_history(tier, msg.get(ATTR_DEVICE_ID), start, end)
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(err))
+        return
+    except OSError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_UNKNOWN_ERROR, str(err))
+        return
+    if points is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "No history for this device")
+        return
+    connection.send_result(msg["id"], {ATTR_TIER: tier, "bucket": bucket, "points": points})
+
+
+def _page_query(msg: dict[str, Any]) -> PageQuery:
+    """Return the page query of a table command."""
+    query = PageQuery(
+        msg[ATTR_TABLE],
+        msg.get(ATTR_SEARCH),
+        msg.get(ATTR_FILTERS),
+        msg.get(ATTR_SORT),
+        msg[ATTR_DESCENDING],
+        msg[ATTR_OFFSET],
+        msg[ATTR_LIMIT],
+    )
+    if unknown := query.unknown_columns():
+        raise vol.Invalid(f"Unknown columns: {', '.join(unknown)}")
+    return query
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/table", **PAGE_SCHEMA})
+@callback
+def websocket_table(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return a page of a table of devices, DNS servers or domains."""
+    try:
+        query = _page_query(msg)
+        coordinator = get_coordinator(hass, msg.get(ATTR_CONFIG_ENTRY_ID))
+    except vol.Invalid as err:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, str(err))
+        return
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(err))
+        return
+    total, rows = query.apply(coordinator.get_view(query.table))
+    connection.send_result(msg["id"], {"total": total, ATTR_OFFSET: query.offset, "rows": rows})
+
+
+@websocket_api.websocket_command({vol.Required("type"): f"{DOMAIN}/subscribe", **PAGE_SCHEMA})
+@callback
+def websocket_subscribe(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Subscribe to a page of a table.
+
+    The first event carries the whole page. After each refresh, an event
+    carries only the rows to upsert and the IDs to remove, with the new
+    row order when it changed, and no event is sent if nothing did.
+    """
+    try:
+        query = _page_query(msg)
+        coordinator = get_coordinator(hass, msg.get(ATTR_CONFIG_ENTRY_ID))
+    except vol.Invalid as err:
+        connection.send_error(msg["id"], websocket_api.ERR_INVALID_FORMAT, str(err))
+        return
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(err))
+        return
+    subscription = PageSubscription(query)
+
+    @callback
+    def forward() -> None:
+        if (diff := subscription.update(coordinator.get_view(query.table))) is not None:
+            connection.send_message(websocket_api.event_message(msg["id"], diff))
+
+    connection.subscriptions[msg["id"]] = coordinator.async_add_listener(forward)
+    connection.send_result(msg["id"])
+    forward()
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): f"{DOMAIN}/query_log",
+        vol.Optional(ATTR_DOMAIN): str,
+        vol.Optional(ATTR_DEVICE_ID): str,
+        vol.Optional(ATTR_STATUS): vol.In(STATUSES),
+        vol.Optional(ATTR_WITHIN): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(ATTR_OFFSET, default=0): vol.All(int, vol.Range(min=0)),
+        vol.Optional(ATTR_LIMIT, default=50): vol.All(int, vol.Range(min=1, max=MAX_PAGE_SIZE)),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): str,
+    }
+)
+@callback
+def websocket_query_log(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict[str, Any]
+) -> None:
+    """Return a page of the locally indexed query log, newest first.
+
+    within is in seconds. Each entry has its Unix time, domain, device
+    ID and status.
+    """
+    try:
+        coordinator = get_coordinator(hass, msg.get(ATTR_CONFIG_ENTRY_ID))
+    except HomeAssistantError as err:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, str(err))
+        return
+    if coordinator.query_index is None:
+        connection.send_error(
+            msg["id"], websocket_api.ERR_NOT_SUPPORTED, "The query log index is disabled"
+        )
+        return
+    since = time.time() - msg[ATTR_WITHIN] if ATTR_WITHIN in msg else None
+    offset = msg[ATTR_OFFSET]
+    total, entries = coordinator.query_index.search(
+        domain=msg.get(ATTR_DOMAIN),
+        device_id=msg.get(ATTR_DEVICE_ID),
+        status=msg.get(ATTR_STATUS),
+        since=since,
+        limit=offset + msg[ATTR_LIMIT],
+    )
+    connection.send_result(
+        msg["id"],
+        {
+            "total": total,
+            ATTR_OFFSET: offset,
+            "rows": entries[offset:],
+            "indexed_since": coordinator.query_index.oldest_time,
+        },
+    )
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Measure event loop blocking of a refresh build with and without executor offload.
+
+Builds synthetic account payloads of increasing size and runs the same
+decode, aggregation and diff job used by the coordinator either inline on
+the event loop or in the default executor, while a heartbeat task records
+how late the loop wakes it up. Runs without Home Assistant installed.
+
+Usage: python scripts/benchmark_offload.py [--devices 1000 5000 20000] [--rounds 5]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import types
+from pathlib import Path
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "adguard_dns"
+
+# Import the pure helper modules without running the integration's __init__,
+# which needs Home Assistant
+package = types.ModuleType("adguard_dns")
+package.__path__ = [str(COMPONENT_DIR)]
+sys.modules["adguard_dns"] = package
+
+from adguard_dns.diff import SnapshotDiffer  # noqa: E402
+from adguard_dns.model import build_snapshot  # noqa: E402
+
+HEARTBEAT = 0.001
+
+
+def build_payloads(devices, seed):
+    """Return raw endpoint bodies for a synthetic account."""
+    rng = random.Random(seed)
+    domains = [f"host{i}.site{i % 3000}.com" for i in range(20000)]
+    servers = [
+        {"id": f"server{i}", "name": f"Server {i}", "settings": {"protection_enabled": True}}
+        for i in range(max(1, devices // 200))
+    ]
+    device_list = [
+        {
+            "id": f"device{i}",
+            "name": f"Device {i}",
+            "device_type": rng.choice(["WINDOWS", "ANDROID", "IOS", "LINUX"]),
+            "dns_server_id": rng.choice(servers)["id"],
+            "queries_count": rng.randrange(100000),
+            "blocked_count": rng.randrange(10000),
+            "settings": {"protection_enabled": True, "detect_doh_auth_only": False},
+            "statistics": {
+                "top_blocked_domains": [
+                    {"domain": rng.choice(domains), "count": rng.randrange(1000)} for _ in range(10)
+                ],
+                "top_queried_domains": [
+                    {"domain": rng.choice(domains), "count": rng.randrange(5000)} for _ in range(10)
+                ],
+            },
+        }
+        for i in range(devices)
+    ]
+    return {
+        "account_limits": json.dumps({"devices": {"limit": devices * 2, "used": devices}}).encode(),
+        "devices": json.dumps({"devices": device_list}).encode(),
+        "dns_servers": json.dumps({"dns_servers": servers}).encode(),
+        "dedicated_addresses": json.dumps({"dedicated_addresses": []}).encode(),
+    }
+
+
+async def heartbeat(lateness, stop):
+    """Record how late each short sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(HEARTBEAT)
+        lateness.append(loop.time() - start - HEARTBEAT)
+
+
+async def measure(payloads, rounds, offload):
+    """Run builds and return (max stall, p99 stall, mean build time)."""
+    loop = asyncio.get_running_loop()
+    differs = {"devices": SnapshotDiffer(), "dns_servers": SnapshotDiffer()}
+    lateness = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lateness, stop))
+    await asyncio.sleep(0.05)
+
+    build_times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        if offload:
+            await loop.run_in_executor(None, build_snapshot, None, payloads, differs, None)
+        else:
+            build_snapshot(None, payloads, differs, None)
+        build_times.append(time.perf_counter() - start)
+        # Let the heartbeat observe the loop between refreshes
+        await asyncio.sleep(0.02)
+
+    stop.set()
+    await beat
+    lateness.sort()
+    p99 = lateness[int(len(lateness) * 0.99) - 1]
+    return lateness[-1], p99, statistics.mean(build_times)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'payload':>10} {'mode':>8} {'max stall':>11} {'p99 stall':>11} {'build':>9}")
+    for devices in args.devices:
+        payloads = build_payloads(devices, args.seed)
+        size = sum(len(body) for body in payloads.values())
+        for offload in (False, True):
+            max_stall, p99, build = await measure(payloads, args.rounds, offload)
+            print(
+                f"{devices:>8} {size / 1024:>8.0f}KB {'offload' if offload else 'inline':>8} "
+                f"{max_stall * 1000:>9.1f}ms {p99 * 1000:>9.1f}ms {build * 1000:>7.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
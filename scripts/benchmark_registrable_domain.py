@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark registrable-domain rollups on a synthetic stream of one million domains.
+
+Compares raw domain aggregation with eTLD+1 aggregation through the bundled
+public suffix trie, with a cold and a warm memo cache. Runs without Home
+Assistant installed.
+
+Usage: python scripts/benchmark_registrable_domain.py [--entries N] [--seed S]
+"""
+
+import argparse
+import random
+import sys
+import time
+import types
+from pathlib import Path
+
+COMPONENT_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "adguard_dns"
+
+# Import the pure helper modules without running the integration's __init__,
+# which needs Home Assistant
+package = types.ModuleType("adguard_dns")
+package.__path__ = [str(COMPONENT_DIR)]
+sys.modules["adguard_dns"] = package
+
+from adguard_dns.aggregation import domain_counts  # noqa: E402
+from adguard_dns.public_suffix import (  # noqa: E402
+    load_public_suffix_trie,
+    registrable_domain,
+)
+
+SUFFIXES = ["com", "net", "org", "io", "co.uk", "com.au", "de", "ru", "co.jp", "github.io"]
+
+
+def build_stream(entries, seed):
+    """Return a Zipf-like stream of hostnames under a few thousand sites."""
+    rng = random.Random(seed)
+    sites = [f"site{i}.{rng.choice(SUFFIXES)}" for i in range(5000)]
+    hosts = [
+        f"{rng.choice(['ads', 'cdn', 'api', 'www', 'img', 't'])}{rng.randrange(20)}.{rng.choice(sites)}"
+        for _ in range(50000)
+    ]
+    weights = [1 / (rank + 1) for rank in range(len(hosts))]
+    return rng.choices(hosts, weights=weights, k=entries)
+
+
+def as_devices(stream, per_device=1000):
+    """Wrap a domain stream in device payloads as returned by the API."""
+    return [
+        {
+            "statistics": {
+                "top_blocked_domains": [
+                    {"domain": domain, "count": 1} for domain in stream[start:start + per_device]
+                ]
+            }
+        }
+        for start in range(0, len(stream), per_device)
+    ]
+
+
+def timed(label, func, *args):
+    """Run func once and print how long it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    stream = build_stream(args.entries, args.seed)
+    devices = as_devices(stream)
+    print(f"{len(stream)} entries, {len(set(stream))} distinct hostnames, {len(devices)} devices\n")
+
+    timed("trie load", load_public_suffix_trie)
+    raw = timed("raw aggregation", domain_counts, devices, "top_blocked_domains")
+
+    registrable_domain.cache_clear()
+    timed("registrable aggregation (cold cache)", domain_counts, devices, "top_blocked_domains", registrable_domain)
+    rolled = timed("registrable aggregation (warm cache)", domain_counts, devices, "top_blocked_domains", registrable_domain)
+    info = registrable_domain.cache_info()
+    print(f"\nmemo cache: {info.currsize} entries, {info.hits / (info.hits + info.misses):.1%} hit ratio")
+
+    distinct = list(set(stream))
+    registrable_domain.cache_clear()
+    start = time.perf_counter()
+    for domain in distinct:
+        registrable_domain(domain)
+    per_lookup = (time.perf_counter() - start) / len(distinct)
+    print(f"uncached trie lookup: {per_lookup * 1e6:.2f} us per domain")
+
+    print(f"\ntop raw domain:         {raw[0][0]} ({raw[0][1]})")
+    print(f"top registrable domain: {rolled[0][0]} ({rolled[0][1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Soak the integration through thousands of refreshes and fail on memory growth.
+
+Sets the integration up in a test Home Assistant instance with every
+platform and optional feature enabled, pointed at a local stand-in for the
+AdGuard DNS API. The stand-in churns devices, rotates and revokes tokens
+and injects errors. After a warm-up, tracemalloc snapshots, live object
+counts and the sizes of the coordinator's state and listeners are sampled
+at regular intervals. The run fails when traced memory or any of those
+sizes keeps growing, and reports the sites that allocated the most.
+
+Needs Home Assistant and pytest-homeassistant-custom-component installed,
+as for the integration's own development environment.
+
+Usage: python scripts/soak.py [--cycles 3000] [--devices 200] [--max-growth 512]
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+import gc
+from pathlib import Path
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from homeassistant import loader  # noqa: E402
+from pytest_homeassistant_custom_component.common import (  # noqa: E402
+    MockConfigEntry,
+    async_test_home_assistant,
+)
+
+from custom_components.adguard_dns import coordinator as coordinator_module  # noqa: E402
+from custom_components.adguard_dns.const import DOMAIN  # noqa: E402
+
+DEVICE_TYPES = ["WINDOWS", "ANDROID", "MAC", "IOS", "LINUX", "ROUTER", "SMART_TV"]
+# Object types listed when reporting live object growth
+REPORT_TYPES = 15
+# Allocation sites listed in the report
+REPORT_SITES = 20
+
+
+class StandInAPI:
+    """A local AdGuard DNS API with churning devices, rotating tokens and errors."""
+
+    def __init__(self, args):
+        """Initialize the account."""
+        self.args = args
+        self.rng = random.Random(args.seed)
+        # Devices are drawn from a bounded pool, so state may churn but not grow
+        self.pool = [f"device{i}" for i in range(args.devices * 2)]
+        self.active = self.rng.sample(self.pool, args.devices)
+        self.counters = {device_id: [0, 0] for device_id in self.pool}
+        self.servers = [f"server{i}" for i in range(max(1, args.devices // 50))]
+        self.domains = [f"host{i}.site{i % 500}.com" for i in range(2000)]
+        self.token = 0
+        self.requests = Counter()
+        # Errors are held back until the integration is set up
+        self.inject = False
+
+    def app(self):
+        """Return the web application serving the API."""
+        app = web.Application()
+        app.router.add_post("/oapi/v1/oauth_token", self.oauth_token)
+        app.router.add_get("/oapi/v1/account/limits", self.account_limits)
+        app.router.add_get("/oapi/v1/devices", self.devices)
+        app.router.add_get("/oapi/v1/dns_servers", self.dns_servers)
+        app.router.add_get("/oapi/v1/dedicated_addresses/ipv4", self.dedicated_addresses)
+        app.router.add_get("/oapi/v1/query_log", self.query_log)
+        app.router.add_put("/oapi/v1/{resource}/{record_id}/settings", self.settings)
+        return app
+
+    def churn(self):
+        """Replace some devices and add activity to the rest."""
+        active = set(self.active)
+        inactive = [device_id for device_id in self.pool if device_id not in active]
+        for _ in range(int(len(self.active) * self.args.churn)):
+            self.active[self.rng.randrange(len(self.active))] = inactive.pop(
+                self.rng.randrange(len(inactive))
+            )
+        for device_id in self.active:
+            counters = self.counters[device_id]
+            queries = self.rng.randrange(50)
+            counters[0] += queries
+            counters[1] += self.rng.randrange(queries + 1) // 4
+            if self.rng.random() < 0.002:
+                # The API occasionally resets a device's counters
+                counters[:] = [0, 0]
+
+    def revoke(self):
+        """Invalidate the current access token, as a rotation on the server side would."""
+        self.token += 1
+
+    def _fault(self, request):
+        """Return an injected failure for a request, if it gets one."""
+        self.requests[request.path] += 1
+        if request.headers.get("Authorization") not in (None, f"Bearer token-{self.token}"):
+            return web.Response(status=401, text="token expired")
+        roll = self.rng.random() if self.inject else 1.0
+        if roll < self.args.error_rate / 2:
+            return web.Response(status=self.rng.choice([429, 500, 502, 503]), text="injected")
+        if roll < self.args.error_rate:
+            return web.Response(body=b'{"truncated": [', content_type="application/json")
+        return None
+
+    async def oauth_token(self, request):
+        """Issue a new access token."""
+        self.requests[request.path] += 1
+        self.token += 1
+        return web.json_response(
+            {
+                "access_token": f"token-{self.token}",
+                "refresh_token": f"refresh-{self.token}",
+                "expires_in": self.args.token_ttl,
+            }
+        )
+
+    async def account_limits(self, request):
+        """Return the account limits."""
+        if fault := self._fault(request):
+            return fault
+        return web.json_response(
+            {"devices": {"limit": len(self.pool), "used": len(self.active)}}
+        )
+
+    async def devices(self, request):
+        """Return the active devices with their statistics."""
+        if fault := self._fault(request):
+            return fault
+        rng = random.Random(self.token)
+        devices = []
+        for device_id in self.active:
+            queries, blocked = self.counters[device_id]
+            number = int(device_id.removeprefix("device"))
+            devices.append(
+                {
+                    "id": device_id,
+                    "name": f"Device {number}",
+                    "device_type": DEVICE_TYPES[number % len(DEVICE_TYPES)],
+                    "dns_server_id": self.servers[number % len(self.servers)],
+                    "queries_count": queries,
+                    "blocked_count": blocked,
+                    "settings": {"protection_enabled": True},
+                    "statistics": {
+                        "top_queried_domains": [
+                            {"domain": rng.choice(self.domains), "count": rng.randrange(1000)}
+                            for _ in range(5)
+                        ],
+                        "top_blocked_domains": [
+                            {"domain": rng.choice(self.domains), "count": rng.randrange(100)}
+                            for _ in range(5)
+                        ],
+                    },
+                }
+            )
+        return web.json_response({"devices": devices})
+
+    async def dns_servers(self, request):
+        """Return the DNS servers, with rules that change now and then."""
+        if fault := self._fault(request):
+            return fault
+        revision = self.token % 3
+        return web.json_response(
+            {
+                "dns_servers": [
+                    {
+                        "id": server_id,
+                        "name": f"Server {server_id}",
+                        "settings": {
+                            "protection_enabled": True,
+                            "filter_lists_settings": {
+                                "enabled": True,
+                                "filter_list": [{"filter_id": "adguard_dns_filter", "enabled": True}],
+                            },
+                            "user_rules_settings": {
+                                "rules": [f"||blocked{i}-{revision}.example^" for i in range(50)]
+                            },
+                        },
+                    }
+                    for server_id in self.servers
+                ]
+            }
+        )
+
+    async def dedicated_addresses(self, request):
+        """Return the dedicated IPv4 addresses."""
+        if fault := self._fault(request):
+            return fault
+        return web.json_response(
+            {
+                "dedicated_addresses": [
+                    {"ip": f"94.140.14.{i}", "device_id": self.active[i]}
+                    for i in range(min(10, len(self.active)))
+                ]
+            }
+        )
+
+    async def query_log(self, request):
+        """Return query log entries in the requested window."""
+        if fault := self._fault(request):
+            return fault
+        time_from = int(request.query["time_from_millis"])
+        time_to = int(request.query["time_to_millis"])
+        items = [
+            {
+                "time_millis": self.rng.randint(time_from, time_to),
+                "domain": self.rng.choice(self.domains) + ".",
+                "device_id": self.rng.choice(self.active),
+                "filtering_info": {
+                    "filtering_status": self.rng.choice(["NONE", "REQUEST_BLOCKED_BY_FILTER"])
+                },
+            }
+            for _ in range(min(self.args.query_log, max(0, (time_to - time_from) // 10)))
+        ]
+        return web.json_response({"items": items, "pages": {}})
+
+    async def settings(self, request):
+        """Accept a settings write."""
+        if fault := self._fault(request):
+            return fault
+        await request.read()
+        return web.Response(status=204)
+
+
+def sizes(hass, coordinator):
+    """Return the sizes of the state that should stay bounded."""
+    stats = coordinator.device_stats
+    return {
+        "device slots": len(stats.slots),
+        "slot map": len(stats.slots.index),
+        "coordinator listeners": len(coordinator._listeners),
+        "device listeners": sum(map(len, coordinator._device_listeners.values())),
+        "device listener keys": len(coordinator._device_listeners),
+        "pending device updates": len(coordinator._pending_device_updates),
+        "pending history": len(coordinator._pending_history),
+        "query index": len(coordinator.query_index) if coordinator.query_index is not None else 0,
+        "rule table": len(coordinator.rules.table.rules),
+        "states": len(hass.states.async_all()),
+        "bus listeners": sum(hass.bus.async_listeners().values()),
+        "tasks": len(asyncio.all_tasks()),
+    }
+
+
+def object_counts():
+    """Return the number of live objects by type name."""
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+def growth(values):
+    """Return how much a series grew from its first to its last third.
+
+    Comparing medians of the thirds ignores one-off spikes, so only growth
+    that is sustained over the run counts.
+    """
+    third = max(1, len(values) // 3)
+    return statistics.median(values[-third:]) - statistics.median(values[:third])
+
+
+async def soak(args):
+    """Run the soak, returning whether it passed."""
+    api = StandInAPI(args)
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    coordinator_module.API_BASE_URL = base_url
+    coordinator_module.OAUTH_URL = f"{base_url}/oapi/v1/oauth_token"
+    try:
+        return await run_cycles(args, api)
+    finally:
+        await runner.cleanup()
+
+
+async def run_cycles(args, api):
+    """Set the integration up and refresh it, returning whether the soak passed."""
+    # Trace from the start, as objects allocated before tracing began would
+    # show up as growth whenever they are replaced by traced ones
+    tracemalloc.start(args.frames)
+    with tempfile.TemporaryDirectory() as config_dir:
+        async with async_test_home_assistant(config_dir=config_dir) as hass:
+            # Let the loader find the integration in this repository
+            hass.data.pop(loader.DATA_CUSTOM_COMPONENTS, None)
+            entry = MockConfigEntry(
+                domain=DOMAIN,
+                data={"access_token": "initial", "refresh_token": "refresh-0"},
+                options={
+                    # Refreshes are driven by the harness, not the poll timer
+                    "update_interval": 3600,
+                    # The shortest window, so the index fills up well within the warm-up
+                    "query_index_window": 1,
+                    "profile_threshold": 0,
+                    "history": True,
+                    "consider_home": 60,
+                },
+            )
+            entry.add_to_hass(hass)
+            if not await hass.config_entries.async_setup(entry.entry_id):
+                print("Setting up the integration failed")
+                return False
+            await hass.async_block_till_done()
+            coordinator = entry.runtime_data
+
+            # Show every device of the pool once, so the entity and device
+            # registries already hold all of them when measuring starts
+            active = api.active
+            for half in (api.pool[::2], api.pool[1::2]):
+                api.active = half
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+            api.active = active
+            api.inject = True
+
+            samples = []
+            first_objects = baseline = None
+            started = time.perf_counter()
+            for cycle in range(1, args.cycles + 1):
+                api.churn()
+                if cycle % args.rotate_every == 0:
+                    api.revoke()
+                if cycle % args.write_every == 0:
+                    device_id = api.rng.choice(api.active)
+                    try:
+                        await hass.services.async_call(
+                            DOMAIN,
+                            "set_protection",
+                            {"enabled": bool(cycle % 2), "device_id": [device_id]},
+                            blocking=True,
+                        )
+                    except Exception as err:  # noqa: BLE001
+                        # Devices churn away and writes hit injected errors
+                        print(f"cycle {cycle}: write failed: {err}", file=sys.stderr)
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+
+                if cycle == args.warmup:
+                    gc.collect()
+                    baseline = tracemalloc.take_snapshot()
+                    first_objects = object_counts()
+                if cycle > args.warmup and (cycle - args.warmup) % args.sample_every == 0:
+                    gc.collect()
+                    traced, _ = tracemalloc.get_traced_memory()
+                    samples.append((cycle, traced, sizes(hass, coordinator)))
+                    print(
+                        f"cycle {cycle:>6}  traced {traced / 1024:>9.0f} KiB  "
+                        f"{time.perf_counter() - started:>7.1f} s"
+                    )
+
+            gc.collect()
+            last_objects = object_counts()
+            final = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            await hass.config_entries.async_unload(entry.entry_id)
+            await hass.async_block_till_done()
+
+    return report(args, api, samples, baseline, final, first_objects, last_objects)
+
+
+def report(args, api, samples, baseline, final, first_objects, last_objects):
+    """Print the results, returning whether the soak passed."""
+    print(f"\nRequests: {sum(api.requests.values())}, token rotations: {api.token}")
+    if len(samples) < 3:
+        print("Not enough samples, run more cycles or sample more often")
+        return False
+
+    passed = True
+    memory = growth([traced for _, traced, _ in samples])
+    print(f"\nTraced memory growth: {memory / 1024:.0f} KiB (limit {args.max_growth} KiB)")
+    if memory > args.max_growth * 1024:
+        passed = False
+
+    print(f"\n{'size':<25} {'first':>8} {'last':>8} {'growth':>8}")
+    for name in samples[0][2]:
+        values = [size[name] for _, _, size in samples]
+        grew = growth(values)
+        # Sizes follow the churning device pool, anything beyond it is a leak
+        flagged = grew > max(args.size_slack, values[0] * 0.1)
+        passed &= not flagged
+        print(
+            f"{name:<25} {values[0]:>8} {values[-1]:>8} {grew:>8.0f}{'  GROWING' if flagged else ''}"
+        )
+
+    print("\nLive objects with the most growth:")
+    for name, count in (last_objects - first_objects).most_common(REPORT_TYPES):
+        print(f"  {name:<30} +{count}")
+
+    print("\nTop allocation sites since the warm-up:")
+    for stat in final.compare_to(baseline, "traceback")[:REPORT_SITES]:
+        print(f"  {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7} blocks")
+        for line in stat.traceback.format()[-2 * min(args.frames, 4):]:
+            print(f"      {line}")
+
+    print("\nPASSED" if passed else "\nFAILED: sustained growth")
+    return passed
+
+
+def main():
+    """Parse the arguments and run the soak."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=200, help="cycles before measuring")
+    parser.add_argument("--sample-every", type=int, default=100)
+    parser.add_argument("--devices", type=int, default=200, help="active devices")
+    parser.add_argument("--churn", type=float, default=0.02, help="share of devices replaced per cycle")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of failed API requests")
+    parser.add_argument("--token-ttl", type=int, default=360, help="access token lifetime (seconds)")
+    parser.add_argument("--rotate-every", type=int, default=97, help="cycles between token revocations")
+    parser.add_argument("--write-every", type=int, default=25, help="cycles between settings writes")
+    parser.add_argument("--query-log", type=int, default=200, help="query log entries per refresh")
+    parser.add_argument("--max-growth", type=int, default=512, help="allowed traced memory growth (KiB)")
+    parser.add_argument("--size-slack", type=int, default=5, help="allowed growth of tracked sizes")
+    parser.add_argument("--frames", type=int, default=8, help="traceback depth of allocations")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.warmup >= args.cycles:
+        parser.error("--warmup must be less than --cycles")
+    sys.exit(0 if asyncio.run(soak(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Fixtures for the AdGuard DNS tests."""
+from pathlib import Path
+import sys
+
+# Make custom_components importable when running pytest from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,44 @@
+"""Tests for the per-device statistics."""
+from __future__ import annotations
+
+from custom_components.adguard_dns.device_stats import DeviceStatistics
+
+
+def _devices(queries: int) -> list[dict]:
+    """Return a device list with one device at the given counters."""
+    return [{"id": "phone", "queries_count": queries, "blocked_count": 0}]
+
+
+def test_update_publishes_copies_of_its_state() -> None:
+    """What an update hands out is not changed by the next update."""
+    stats = DeviceStatistics(3.0, 180)
+    first = stats.update(_devices(10), 0)
+    second = stats.update(_devices(70), 60)
+    anomalous, details = second.anomaly_state["phone"]
+    assert anomalous is False
+    assert details["queries_per_minute"] == 60
+    assert first.stored["last_seen"] == {}
+    assert second.stored["last_seen"] == {"phone": 60}
+
+    stats.update(_devices(200), 120)
+    assert second.anomaly_state["phone"][1]["queries_per_minute"] == 60
+    assert second.stored["last_seen"] == {"phone": 60}
+
+
+def test_removed_device_has_no_anomaly_state() -> None:
+    """Devices that left the account are dropped from the published state."""
+    stats = DeviceStatistics(3.0, 180)
+    stats.update(_devices(10), 0)
+    update = stats.update([], 60)
+    assert update.anomaly_state == {}
+    assert "phone" in update.changed
+
+
+def test_rate_changes_are_reported_apart_from_counters() -> None:
+    """A device whose counters are flat but whose rates move only wakes rate sensors."""
+    stats = DeviceStatistics(3.0, 180)
+    stats.update(_devices(10), 0)
+    stats.update(_devices(70), 60)
+    update = stats.update(_devices(70), 120)
+    assert update.changed == []
+    assert update.rates_changed == ["phone"]
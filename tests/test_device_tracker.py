@@ -0,0 +1,71 @@
+"""Tests for the AdGuard DNS device tracker."""
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from homeassistant.const import STATE_HOME, STATE_NOT_HOME
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant
+from pytest_homeassistant_custom_component.common import (
+    MockEntityPlatform,
+    async_test_home_assistant,
+)
+
+from custom_components.adguard_dns.device_tracker import AdGuardDNSDeviceTracker
+
+
+class StandInCoordinator:
+    """The parts of the coordinator a tracker reads."""
+
+    def __init__(self, presence: dict[str, tuple[bool, float | None]]) -> None:
+        """Initialize with the presence of each device."""
+        self.data: dict[str, Any] = {
+            "devices": {"devices": [{"id": "phone", "name": "Phone"}]},
+            "device_presence": presence,
+        }
+        self.last_update_success = True
+        self.listeners: list[CALLBACK_TYPE] = []
+
+    def async_add_listener(self, update_callback: CALLBACK_TYPE, context: Any = None) -> CALLBACK_TYPE:
+        """Register a listener called on each update."""
+        self.listeners.append(update_callback)
+        return lambda: self.listeners.remove(update_callback)
+
+    def async_update_listeners(self) -> None:
+        """Notify the listeners, as a refresh would."""
+        for update_callback in list(self.listeners):
+            update_callback()
+
+    def get_record(self, resource: str, record_id: str) -> dict[str, Any]:
+        """Return a record of the current data."""
+        return next(
+            (record for record in self.data[resource][resource] if record["id"] == record_id), {}
+        )
+
+
+@pytest.mark.asyncio
+# The entity registry schedules a delayed save when the tracker is registered
+@pytest.mark.parametrize("expected_lingering_timers", [True])
+async def test_state_follows_presence() -> None:
+    """The written state is home while the device is active."""
+    async with async_test_home_assistant() as hass:
+        await _check_state_follows_presence(hass)
+
+
+async def _check_state_follows_presence(hass: HomeAssistant) -> None:
+    """Add a tracker and check its state as presence changes."""
+    coordinator = StandInCoordinator({"phone": (True, 1_700_000_000.0)})
+    tracker = AdGuardDNSDeviceTracker(coordinator, "phone")  # type: ignore[arg-type]
+    platform = MockEntityPlatform(hass, domain="device_tracker", platform_name="adguard_dns")
+    await platform.async_add_entities([tracker])
+
+    state = hass.states.get(tracker.entity_id)
+    assert state is not None
+    assert state.state == STATE_HOME
+    assert state.attributes["source_type"] == "router"
+    assert tracker.unique_id == "adguard_dns_device_phone"
+
+    coordinator.data["device_presence"] = {"phone": (False, 1_700_000_000.0)}
+    coordinator.async_update_listeners()
+    assert hass.states.get(tracker.entity_id).state == STATE_NOT_HOME
@@ -0,0 +1,99 @@
+"""Tests for the query log export writer."""
+from __future__ import annotations
+
+import gzip
+import json
+from pathlib import Path
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from custom_components.adguard_dns.export import QueryLogExportWriter
+
+PARAMS = {"start": "2026-01-01T00:00:00+00:00", "end": "2026-01-02T00:00:00+00:00"}
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def _page(number: int) -> list[dict]:
+    """Return a page of query log items."""
+    return [
+        {"time_millis": number * 1000 + i, "domain": f"host{i}.example.", "device_id": "d1"}
+        for i in range(500)
+    ]
+
+
+def _write_pages(writer: QueryLogExportWriter, first: int, last: int) -> None:
+    """Write pages first to last with their checkpoints."""
+    for number in range(first, last + 1):
+        writer.write_page(
+            _page(number),
+            {"cursor": f"c{number}", "records": number * 500, "pages": number, "done": False},
+        )
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_resume_after_kill_mid_page(tmp_path: Path, export_format: str) -> None:
+    """A writer killed halfway through a page resumes into a valid gzip file."""
+    path = tmp_path / f"export.{export_format}.gz"
+    params = {**PARAMS, "format": export_format}
+    # Write two pages, then die with half of the third one on disk
+    script = textwrap.dedent(
+        f"""
+        import os, signal, sys
+        sys.path.insert(0, {str(REPO_DIR)!r})
+        sys.path.insert(0, {str(Path(__file__).parent)!r})
+        from pathlib import Path
+        from test_export import _write_pages
+        from custom_components.adguard_dns.export import QueryLogExportWriter
+
+        writer = QueryLogExportWriter(Path({str(path)!r}), {export_format!r}, {params!r})
+        writer.open()
+        _write_pages(writer, 1, 2)
+        file = writer._file
+        real_write = file.write
+
+        def write_half(data):
+            real_write(data[: len(data) // 2])
+            file.flush()
+            os.kill(os.getpid(), signal.SIGKILL)
+
+        file.write = write_half
+        _write_pages(writer, 3, 3)
+        """
+    )
+    result = subprocess.run([sys.executable, "-c", script], check=False)
+    assert result.returncode == -9
+    checkpoint = json.loads(path.with_name(f"{path.name}.checkpoint").read_text())
+    assert checkpoint["pages"] == 2
+    assert path.stat().st_size > checkpoint["offset"]
+
+    writer = QueryLogExportWriter(path, export_format, params)
+    assert writer.open()["cursor"] == "c2"
+    _write_pages(writer, 3, 4)
+    writer.close(complete=True)
+
+    lines = gzip.decompress(path.read_bytes()).decode().splitlines()
+    if export_format == "csv":
+        assert lines[0].startswith("time_millis,")
+        lines = lines[1:]
+        times = [int(line.split(",")[0]) for line in lines]
+    else:
+        times = [json.loads(line)["time_millis"] for line in lines]
+    assert times == [item["time_millis"] for number in range(1, 5) for item in _page(number)]
+    assert not path.with_name(f"{path.name}.checkpoint").exists()
+
+
+def test_checkpoint_for_other_range_starts_over(tmp_path: Path) -> None:
+    """A checkpoint of a different export is ignored."""
+    path = tmp_path / "export.ndjson.gz"
+    writer = QueryLogExportWriter(path, "ndjson", {**PARAMS, "format": "ndjson"})
+    writer.open()
+    _write_pages(writer, 1, 1)
+    writer.close(complete=False)
+
+    other = QueryLogExportWriter(path, "ndjson", {**PARAMS, "format": "csv"})
+    assert other.open() is None
+    other.close(complete=True)
+    assert path.read_bytes() == b""
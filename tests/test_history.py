@@ -0,0 +1,45 @@
+"""Tests for the on-disk query history."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from custom_components.adguard_dns import history
+from custom_components.adguard_dns.history import (
+    LAST_SEEN_SAVE_INTERVAL,
+    SERIES_FILE,
+    HistoryBatch,
+    HistoryStore,
+)
+
+TIERS = {"minute": (60, 60)}
+
+
+def _saved_last_seen(path: Path, device_id: str) -> float:
+    """Return the last seen time of a device in the saved series map."""
+    return json.loads((path / SERIES_FILE).read_text(encoding="utf-8"))[device_id][1]
+
+
+def test_last_seen_is_saved(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Last seen updates reach disk after the save interval and on close."""
+    clock = [1000.0]
+    monkeypatch.setattr(history.time, "monotonic", lambda: clock[0])
+    store = HistoryStore(tmp_path, TIERS)
+    store.open()
+
+    store.write([HistoryBatch(100.0, [("phone", 1, 0)])])
+    assert _saved_last_seen(tmp_path, "phone") == 100.0
+
+    # Within the interval only memory changes
+    store.write([HistoryBatch(160.0, [("phone", 1, 0)])])
+    assert _saved_last_seen(tmp_path, "phone") == 100.0
+
+    clock[0] += LAST_SEEN_SAVE_INTERVAL
+    store.write([HistoryBatch(220.0, [("phone", 1, 0)])])
+    assert _saved_last_seen(tmp_path, "phone") == 220.0
+
+    store.write([HistoryBatch(280.0, [("phone", 1, 0)])])
+    store.close()
+    assert _saved_last_seen(tmp_path, "phone") == 280.0
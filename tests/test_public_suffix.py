@@ -0,0 +1,56 @@
+"""Tests for the registrable domain lookup."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.adguard_dns.public_suffix import (
+    load_public_suffix_trie,
+    registrable_domain,
+)
+
+
+@pytest.fixture(autouse=True)
+def trie() -> None:
+    """Load the bundled list and start every test with an empty cache."""
+    load_public_suffix_trie()
+    registrable_domain.cache_clear()
+
+
+@pytest.mark.parametrize(
+    ("domain", "expected"),
+    [
+        ("www.example.com", "example.com"),
+        ("a.b.example.co.uk", "example.co.uk"),
+        ("WWW.Example.COM.", "example.com"),
+        ("com", "com"),
+        ("host.unlisted-tld", "host.unlisted-tld"),
+    ],
+)
+def test_registrable_domain(domain: str, expected: str) -> None:
+    """Domains roll up to their registrable domain."""
+    assert registrable_domain(domain) == expected
+
+
+@pytest.mark.parametrize(
+    ("domain", "expected"),
+    [
+        ("foo..com", "foo..com"),
+        (".com", ".com"),
+        (".example.com", ".example.com"),
+        ("..", ""),
+        ("", ""),
+        ("a..", "a"),
+    ],
+)
+def test_empty_labels_are_returned_unchanged(domain: str, expected: str) -> None:
+    """Malformed names with empty labels do not raise."""
+    assert registrable_domain(domain) == expected
+    # A second lookup walks the trie again from a clean cache
+    registrable_domain.cache_clear()
+    assert registrable_domain(domain) == expected
+
+
+def test_labels_matching_trie_keys() -> None:
+    """Labels that look like the trie's markers are plain labels."""
+    assert registrable_domain("x.!com") == "x.!com"
+    assert registrable_domain("a.b.*.com") == "*.com"